@@ -1,26 +1,35 @@
 import os
 import streamlit as st
-import json
 import tempfile
 from pathlib import Path
 from datetime import datetime
-import google.generativeai as genai
 
 # Import utility modules
 from app.utils.document_processor import (
     read_pdf, read_docx, 
-    fill_template, generate_pdf, generate_docx
+    export_document, save_export_async
 )
 try:
     # Try the new module name first
-    from app.utils.api import initialize_api, extract_document_content, analyze_template, get_preferred_model
+    from app.utils.api import (
+        initialize_api, get_api_status, extract_document_content, analyze_template, get_preferred_model,
+        clear_model_cache, is_model_not_found_error, create_chat_context, analyze_template_placeholders
+    )
 except ImportError:
     # Fall back to the old module name
-    from app.utils.gemini_api import initialize_gemini as initialize_api, extract_document_content, analyze_template, get_preferred_model
+    from app.utils.gemini_api import (
+        initialize_gemini as initialize_api, get_api_status, extract_document_content, analyze_template,
+        get_preferred_model, clear_model_cache, is_model_not_found_error, create_chat_context,
+        analyze_template_placeholders
+    )
 
+from app.utils.llm_client import get_client
+from app.utils.structured_output import parse_json_response
+from app.utils.template_engine import find_template_fields, compile_template
 from app.utils.template_manager import (
     get_available_templates, save_template, 
-    save_uploaded_template, get_template_path, read_template, list_templates
+    save_uploaded_template, get_template_path, read_template, list_templates, get_template_info,
+    record_template_use, get_compiled_template
 )
 
 # Ensure exports directory exists
@@ -35,15 +44,24 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource(show_spinner=False)
+def init_api():
+    """Configure the API once per process; the model check runs in the background."""
+    initialize_api()
+    return True
+
 # Initialize API
 api_initialized = False
 try:
-    initialize_api()
-    api_initialized = True
+    api_initialized = init_api()
 except Exception as e:
     st.error(f"Failed to initialize AI API: {str(e)}")
     st.sidebar.error("API key not found or invalid")
     st.sidebar.info("You'll need to add API_KEY to your environment variables or .env file.")
+else:
+    api_status = get_api_status()
+    if api_status["healthy"] is False:
+        st.sidebar.warning(f"AI API check failed: {api_status['error']}")
 
 # Set up main title
 st.title("Document Generation App")
@@ -66,7 +84,7 @@ with st.sidebar:
     st.subheader("Upload Template")
     uploaded_template = st.file_uploader(
         "Upload a custom template",
-        type=["txt", "pdf"],
+        type=["txt", "pdf", "docx"],
         key="template_upload"
     )
     
@@ -126,9 +144,12 @@ with tab1:
                     with st.expander("Document Content"):
                         st.text(document_text)
                     
+                    # Kept for the AI Assistant and for manual processing
+                    st.session_state.document_text = document_text
+                    
                     # Analyze with AI if initialized
                     if api_initialized:
-                        analysis_result = extract_document_content(document_text)
+                        analysis_result = extract_document_content(document_text, uploaded_document.getvalue())
                         
                         if isinstance(analysis_result, str) and analysis_result.startswith("Error"):
                             st.error(analysis_result)
@@ -137,7 +158,9 @@ with tab1:
                             
                             # Try to parse the analysis result
                             try:
-                                analyzed_data = json.loads(analysis_result)
+                                analyzed_data = parse_json_response(analysis_result)
+                                if analyzed_data is None:
+                                    raise ValueError("The analysis is not a JSON object")
                                 st.session_state.analyzed_data = analyzed_data
                                 
                                 # Display analysis result
@@ -156,8 +179,6 @@ with tab1:
                                 st.text(analysis_result)  # Display the raw result
                     else:
                         st.warning("AI service not initialized. Cannot analyze document.")
-                        # Store the document text for manual processing
-                        st.session_state.document_text = document_text
 
 # Tab 2: Fill Template
 with tab2:
@@ -178,17 +199,14 @@ with tab2:
             
             # Extract fields from template
             if api_initialized:
-                template_fields = analyze_template(template_content)
+                template_fields = analyze_template(template_content, selected_template)
                 if isinstance(template_fields, str) and template_fields.startswith("Error"):
                     st.error(template_fields)
                     template_fields = []
             else:
-                # Simple field extraction as fallback
-                template_fields = [
-                    field.strip("[]") for field in 
-                    template_content.split("[") if "]" in field
-                ]
-                template_fields = list(set(template_fields))
+                # Placeholders found locally when the template was registered
+                template_info = get_template_info(selected_template)
+                template_fields = template_info.placeholders if template_info else find_template_fields(template_content)
         else:
             st.error(template_content)
     
@@ -281,9 +299,20 @@ with tab2:
             submit_button = st.form_submit_button("Generate Document")
             
             if submit_button:
-                filled_content = fill_template(template_content, field_values)
+                compiled_template = get_compiled_template(template_path)
+                if not compiled_template.fields and api_initialized:
+                    # Placeholders in another notation, such as {{CLIENT_NAME}}, found by the model
+                    placeholders = analyze_template_placeholders(template_content, selected_template)
+                    if isinstance(placeholders, dict) and placeholders:
+                        compiled_template = compile_template(template_content, placeholders)
+                filled_content = compiled_template.render(field_values)
                 st.session_state.filled_content = filled_content
                 st.session_state.current_template = selected_template
+                # Kept so that .docx templates can be filled natively on export,
+                # which only replaces [FIELD_NAME] placeholders
+                st.session_state.current_template_path = template_path if compiled_template.tokens is None else None
+                st.session_state.field_values = field_values
+                record_template_use(selected_template)
                 
                 st.success("Template filled successfully! Go to the Export Document tab to export your document.")
                 
@@ -327,31 +356,29 @@ with tab3:
                 st.error("Error: Document content is empty. Make sure you have filled the template.")
                 st.stop()
             
-            # Create export path
-            if export_format == "PDF":
-                export_path = EXPORTS_DIR / f"{export_name}.pdf"
-                success = generate_pdf(filled_content, str(export_path))
-            else:  # DOCX
-                export_path = EXPORTS_DIR / f"{export_name}.docx"
-                success = generate_docx(filled_content, str(export_path))
+            # Render in memory, reusing identical earlier exports; the copy in
+            # the exports folder is saved in the background
+            export_path = EXPORTS_DIR / f"{export_name}.{export_format.lower()}"
+            file_data = export_document(
+                filled_content, export_format,
+                st.session_state.get('current_template_path'), st.session_state.get('field_values')
+            )
             
-            if success:
+            if file_data is not None:
+                save_export_async(file_data, str(export_path))
                 st.success(f"Document exported successfully to {export_path}")
                 
                 # Check file size for debugging
-                file_size = os.path.getsize(export_path)
-                st.info(f"Generated file size: {file_size} bytes")
+                st.info(f"Generated file size: {len(file_data)} bytes")
                 
                 # Create a download button
-                with open(export_path, "rb") as file:
-                    file_data = file.read()
-                    st.download_button(
-                        label=f"Download {export_format}",
-                        data=file_data,
-                        file_name=export_path.name,
-                        mime=("application/pdf" if export_format == "PDF" 
-                              else "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-                    )
+                st.download_button(
+                    label=f"Download {export_format}",
+                    data=file_data,
+                    file_name=export_path.name,
+                    mime=("application/pdf" if export_format == "PDF" 
+                          else "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+                )
             else:
                 st.error(f"Failed to export document as {export_format}")
     else:
@@ -364,6 +391,10 @@ st.subheader("AI Assistant")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Conversation state sent to the model: recent turns, a summary of older ones and the document
+if "chat_context" not in st.session_state:
+    st.session_state.chat_context = create_chat_context()
+
 # Define the chat API status
 chat_api_available = api_initialized
 
@@ -386,29 +417,20 @@ if chat_api_available:
         
         # Get response from AI
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Get current document context if available
-                context = ""
-                if 'filled_content' in st.session_state:
-                    context = f"Current document content:\n{st.session_state.filled_content}\n\n"
-                
-                # Create the prompt with context
-                full_prompt = f"""You are an AI assistant embedded in a Document Generation App. 
-                Your purpose is to help users with:
-                1. Selecting and filling document templates
-                2. Analyzing uploaded documents
-                3. Generating documents from templates
-                4. Exporting documents in PDF or DOCX format
-                
-                The app has templates like business letters, invoices, and contracts.
-                
-                When users ask to generate documents, help them use the app's features rather than just describing what you would do.
-                Refer them to use the template selection, document upload, or export functions in the app interface.
-                
-                Current document context:
-                {context}
-                
-                User query: {prompt}"""
+            # Build a bounded prompt with the document, the conversation so far and the question
+            chat_context = st.session_state.chat_context
+            chat_context.set_document(
+                st.session_state.get('filled_content') or st.session_state.get('document_text', '')
+            )
+            
+            # Simple lookups such as "What is the due date?" are answered from the document index
+            lookup_answer = chat_context.lookup(prompt)
+            if lookup_answer:
+                st.markdown(lookup_answer)
+                st.session_state.messages.append({"role": "assistant", "content": lookup_answer})
+                chat_context.add_turn(prompt, lookup_answer)
+            else:
+                full_prompt = chat_context.build_prompt(prompt)
                 
                 try:
                     # Get the preferred model
@@ -418,14 +440,14 @@ if chat_api_available:
                         st.error("Error: No suitable AI models available with your API key")
                     else:
                         print(f"Using model: {model_name} for chat")
-                        model = genai.GenerativeModel(model_name)
                         
                         try:
-                            response = model.generate_content(full_prompt)
-                            st.write(response.text)
+                            # Render the answer token by token as it arrives
+                            response_text = st.write_stream(get_client().generate_stream(model_name, full_prompt))
                             
                             # Add assistant response to chat history
-                            st.session_state.messages.append({"role": "assistant", "content": response.text})
+                            st.session_state.messages.append({"role": "assistant", "content": response_text})
+                            chat_context.add_turn(prompt, response_text)
                         except Exception as api_error:
                             error_str = str(api_error)
                             if "429" in error_str or "quota" in error_str.lower() or "exhausted" in error_str.lower():
@@ -433,6 +455,8 @@ if chat_api_available:
                                 st.error(error_msg)
                                 st.session_state.messages.append({"role": "assistant", "content": error_msg})
                             else:
+                                if is_model_not_found_error(api_error):
+                                    clear_model_cache()
                                 raise api_error
                 except Exception as e:
                     st.error(f"Error communicating with AI service: {str(e)}")
@@ -1,4 +1,9 @@
 import os
+import re
+import json
+import time
+import hashlib
+import threading
 import google.generativeai as genai
 from dotenv import load_dotenv
 
@@ -6,63 +11,380 @@ from dotenv import load_dotenv
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-def initialize_api():
-    """Initialize the AI API with the API key."""
+from .cache import CACHE_DIR, TEMPLATE_ANALYSIS_CACHE, EXTRACTION_CACHE, get_cache, make_key
+from .template_engine import find_template_fields
+from .chunking import split_into_chunks, merge_extraction_results
+from .structured_output import (
+    EXTRACTION_SCHEMA, TEMPLATE_FIELDS_SCHEMA, json_generation_config, parse_json_response, matches_schema
+)
+from .llm_client import get_client
+from .chat_context import ChatContext
+from .prompts import (
+    build_prompt, clean_document_text, count_tokens, TEMPLATE_ANALYSIS_PROMPT_TOKENS, CHAT_PROMPT_TOKENS
+)
+
+# Model resolution cache settings
+MODEL_CACHE_TTL = int(os.getenv("MODEL_CACHE_TTL", "3600"))
+MODEL_CACHE_FILE = CACHE_DIR / "preferred_model.json"
+
+_model_cache = {"name": None, "resolved_at": 0.0}
+_model_cache_lock = threading.Lock()
+_model_refresh_thread = None
+
+# Bump when the template analysis prompt or parsing changes
+TEMPLATE_ANALYSIS_PROMPT_VERSION = "4"
+
+# Bump when the document extraction prompt changes
+EXTRACTION_PROMPT_VERSION = "3"
+
+# Documents estimated above this many tokens are extracted chunk by chunk
+EXTRACTION_CHUNK_TOKENS = int(os.getenv("EXTRACTION_CHUNK_TOKENS", "8000"))
+
+_api_state = {"configured": False, "healthy": None, "error": None, "model_count": 0, "checked_at": 0.0}
+_api_state_lock = threading.Lock()
+_health_check_thread = None
+
+def _check_api_health():
+    """List the available models once and record whether a Gemini model can be used."""
+    try:
+        model_names = [model.name for model in genai.list_models()]
+        model_name = _select_preferred_model(model_names)
+        if model_name:
+            # Warm the model cache so the first request does not list models again
+            _store_model_cache(model_name)
+            error = None
+        else:
+            error = "No Gemini models found"
+            print(f"Warning: {error}")
+    except Exception as e:
+        model_names = []
+        model_name = None
+        error = str(e)
+        print(f"Error checking available models: {error}")
+    with _api_state_lock:
+        _api_state.update(
+            healthy=model_name is not None, error=error,
+            model_count=len(model_names), checked_at=time.time()
+        )
+
+def initialize_api(wait=False):
+    """
+    Initialize the AI API with the API key, once per process.
+    
+    The health check that lists the available models runs in a background
+    thread, so this returns without waiting on the network. Later calls only
+    return; the result of the check is kept in get_api_status().
+    
+    Args:
+        wait (bool): Block until the health check has finished
+    """
+    global _health_check_thread
     if not API_KEY:
         raise ValueError("GEMINI_API_KEY not found in environment variables")
     
-    genai.configure(api_key=API_KEY)
+    with _api_state_lock:
+        if not _api_state["configured"]:
+            genai.configure(api_key=API_KEY)
+            _api_state["configured"] = True
+            _health_check_thread = threading.Thread(target=_check_api_health, daemon=True)
+            _health_check_thread.start()
+        thread = _health_check_thread
+    if wait and thread is not None:
+        thread.join()
+
+def get_api_status():
+    """
+    Get the result of the API health check.
     
-    # Test the connection and model availability
-    try:
-        models = genai.list_models()
-        available_models = [model.name for model in models]
-        print(f"Available models: {available_models}")
-        
-        # Find the appropriate Gemini Pro model
-        gemini_models = [name for name in available_models if "gemini" in name]
-        if gemini_models:
-            print(f"Found Gemini models: {gemini_models}")
+    Returns:
+        dict: "configured", "healthy" (None while the check is running),
+            "error", "model_count" and "checked_at"
+    """
+    with _api_state_lock:
+        return dict(_api_state)
+
+def _api_key_fingerprint():
+    """Short hash of the API key so cached models are not shared across keys."""
+    return hashlib.sha256((API_KEY or "").encode("utf-8")).hexdigest()[:16]
+
+def _select_preferred_model(model_names):
+    """
+    Pick the preferred Gemini model from a list of model names in one pass.
+    
+    Preference order: Gemini 1.5 Pro, any Gemini 1.5 model, any non-Vision
+    Gemini model, then any Gemini model.
+    
+    Args:
+        model_names (list): Model names as returned by the API
+        
+    Returns:
+        str: The preferred model name, or None if there is no Gemini model
+    """
+    best_name = None
+    best_rank = None
+    for name in model_names:
+        if "gemini" not in name:
+            continue
+        if "vision" in name:
+            rank = 3
+        elif "gemini-1.5-pro" in name:
+            rank = 0
+        elif "gemini-1.5" in name:
+            rank = 1
         else:
-            print("Warning: No Gemini models found")
+            rank = 2
+        if best_rank is None or rank < best_rank:
+            best_name, best_rank = name, rank
+            if rank == 0:
+                break
+    return best_name
+
+def _resolve_preferred_model():
+    """Query the API for available models and select the preferred one."""
+    return _select_preferred_model([model.name for model in genai.list_models()])
+
+def _load_model_cache():
+    """Load a previously resolved model from disk into the in-memory cache."""
+    try:
+        with open(MODEL_CACHE_FILE, 'r') as file:
+            cached = json.load(file)
+        if cached.get("api_key") == _api_key_fingerprint() and cached.get("name"):
+            _model_cache["name"] = cached["name"]
+            _model_cache["resolved_at"] = float(cached.get("resolved_at", 0.0))
+    except (OSError, ValueError):
+        pass
+
+def _store_model_cache(model_name):
+    """Store a resolved model in memory and persist it to disk."""
+    with _model_cache_lock:
+        _model_cache["name"] = model_name
+        _model_cache["resolved_at"] = time.time()
+        cached = {
+            "name": model_name,
+            "resolved_at": _model_cache["resolved_at"],
+            "api_key": _api_key_fingerprint(),
+        }
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = MODEL_CACHE_FILE.with_suffix(".tmp")
+        with open(tmp_path, 'w') as file:
+            json.dump(cached, file)
+        os.replace(tmp_path, MODEL_CACHE_FILE)
+    except OSError as e:
+        print(f"Error saving model cache: {str(e)}")
+
+def _refresh_model_cache():
+    """Re-resolve the preferred model, keeping the cached one on failure."""
+    try:
+        model_name = _resolve_preferred_model()
+        if model_name:
+            _store_model_cache(model_name)
     except Exception as e:
-        print(f"Error checking available models: {str(e)}")
+        print(f"Error refreshing preferred model: {str(e)}")
+
+def _start_background_refresh():
+    """Refresh the model cache in a daemon thread unless one is already running."""
+    global _model_refresh_thread
+    with _model_cache_lock:
+        if _model_refresh_thread is not None and _model_refresh_thread.is_alive():
+            return
+        _model_refresh_thread = threading.Thread(target=_refresh_model_cache, daemon=True)
+        _model_refresh_thread.start()
+
+def clear_model_cache():
+    """Forget the cached model, in memory and on disk."""
+    with _model_cache_lock:
+        _model_cache["name"] = None
+        _model_cache["resolved_at"] = 0.0
+    try:
+        os.remove(MODEL_CACHE_FILE)
+    except OSError:
+        pass
+
+def is_model_not_found_error(error):
+    """Check whether an API error means the requested model does not exist."""
+    error_str = str(error).lower()
+    return "404" in error_str or ("model" in error_str and "not found" in error_str)
 
 def get_preferred_model():
-    """Get the preferred Gemini model, prioritizing Gemini 1.5 Pro."""
+    """
+    Get the preferred Gemini model, prioritizing Gemini 1.5 Pro.
+    
+    The result is cached for MODEL_CACHE_TTL seconds, in memory and on disk.
+    A stale entry is still returned immediately while a background thread
+    resolves the model again; only a cold cache blocks on the API.
+    
+    Returns:
+        str: The preferred model name, or None if none is available
+    """
+    with _model_cache_lock:
+        if _model_cache["name"] is None:
+            _load_model_cache()
+        model_name = _model_cache["name"]
+        resolved_at = _model_cache["resolved_at"]
+    
+    if model_name:
+        if time.time() - resolved_at > MODEL_CACHE_TTL:
+            _start_background_refresh()
+        return model_name
+    
     try:
-        models = genai.list_models()
-        # First preference: Gemini 1.5 Pro
-        for model in models:
-            if "gemini-1.5-pro" in model.name and "vision" not in model.name:
-                return model.name
-        
-        # Second preference: Any Gemini 1.5 model
-        for model in models:
-            if "gemini-1.5" in model.name and "vision" not in model.name:
-                return model.name
-        
-        # Third preference: Any Gemini model that's not Vision
-        for model in models:
-            if "gemini" in model.name and "vision" not in model.name:
-                return model.name
-        
-        # If no preferred models found, return the first Gemini model
-        gemini_models = [model.name for model in models if "gemini" in model.name]
-        if gemini_models:
-            return gemini_models[0]
-        
-        return None
+        model_name = _resolve_preferred_model()
+        if model_name:
+            _store_model_cache(model_name)
+        return model_name
     except Exception as e:
         print(f"Error getting preferred model: {str(e)}")
         return None
 
-def extract_document_content(document_text):
+def normalize_document_text(document_text):
+    """Collapse whitespace so trivially different extractions share a cache key."""
+    return " ".join(document_text.split())
+
+EXTRACTION_INSTRUCTIONS = """
+    Extract key information from the following document:
+"""
+
+EXTRACTION_FIELDS = """
+    Identify and structure the following information as a JSON object:
+    - Names of people or organizations
+    - Dates
+    - Addresses
+    - Contact information
+    - Financial information (if present)
+    - Key topics or subjects
+    - Any important statements or claims
+"""
+
+TEMPLATE_ANALYSIS_INSTRUCTIONS = """
+    Analyze the following document template and identify all placeholder fields.
+    Template:
+"""
+
+TEMPLATE_ANALYSIS_FIELDS = """
+    Placeholders may use any notation, such as {{FIELD_NAME}}, <FIELD_NAME> or __FIELD_NAME__.
+    Return each placeholder exactly as it appears in the template, delimiters included.
+    Leave out unlabeled blanks such as ______.
+"""
+
+# Delimiters around a placeholder token, such as the braces of {{CLIENT_NAME}}
+_TOKEN_DELIMITERS = re.compile(r"^[\W_]+|[\W_]+$")
+
+CHAT_INSTRUCTIONS = """
+    You are an AI assistant embedded in a Document Generation App.
+    Your purpose is to help users with:
+    1. Selecting and filling document templates
+    2. Analyzing uploaded documents
+    3. Generating documents from templates
+    4. Exporting documents in PDF or DOCX format
+    
+    The app has templates like business letters, invoices, and contracts.
+    
+    When users ask to generate documents, help them use the app's features rather than just describing what you would do.
+    Refer them to use the template selection, document upload, or export functions in the app interface.
+    
+    Current document context:
+"""
+
+CHAT_SUMMARY_INSTRUCTIONS = """
+    Update the summary of a conversation between a user and the assistant of a Document Generation App.
+    Keep names, values, decisions and requests the user may refer to later, and drop small talk.
+    Answer with the summary only, in at most {max_words} words.
+"""
+
+def _extraction_prompt(document_text):
+    """Build the document extraction prompt."""
+    return build_prompt(EXTRACTION_INSTRUCTIONS, document_text, EXTRACTION_FIELDS)
+
+def summarize_chat(summary, turns, max_tokens):
+    """
+    Roll chat turns into the running conversation summary using the model.
+    
+    Args:
+        summary (str): Summary of earlier turns
+        turns (list): (question, answer) pairs to add to the summary
+        max_tokens (int): Token budget for the summary
+        
+    Returns:
+        str: The updated summary
+    """
+    model_name = get_preferred_model()
+    if not model_name:
+        raise RuntimeError("No suitable AI models available with your API key")
+    transcript = "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+    prompt = build_prompt(
+        CHAT_SUMMARY_INSTRUCTIONS.format(max_words=max_tokens * 3 // 4),
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}",
+        "Updated summary:",
+        max_tokens=CHAT_PROMPT_TOKENS
+    )
+    response = get_client().generate_sync(model_name, prompt)
+    return response.text.strip()
+
+def create_chat_context():
+    """
+    Create the conversation state for the AI Assistant.
+    
+    Returns:
+        ChatContext: Context that builds bounded chat prompts
+    """
+    return ChatContext(CHAT_INSTRUCTIONS, summarizer=summarize_chat)
+
+def _parse_extraction(response_text):
+    """Parse and validate one extraction response, or return None."""
+    parsed = parse_json_response(response_text)
+    if parsed is None or not matches_schema(parsed, EXTRACTION_SCHEMA):
+        return None
+    return parsed
+
+def _extract_chunked(model_name, chunks):
+    """
+    Run the extraction prompt on every chunk concurrently and merge the results.
+    
+    Args:
+        model_name (str): Name of the model to use
+        chunks (list): Chunk texts in document order
+        
+    Returns:
+        tuple: (merged extraction as JSON text, or None if no chunk gave valid
+            JSON; True if every chunk did)
+    """
+    prompts = [_extraction_prompt(chunk) for chunk in chunks]
+    responses = [
+        response.text for response in get_client().generate_many_sync(
+            model_name, prompts, generation_config=json_generation_config(EXTRACTION_SCHEMA)
+        )
+    ]
+    
+    results = []
+    for index, response_text in enumerate(responses):
+        parsed = _parse_extraction(response_text)
+        if parsed is None:
+            print(f"Could not parse extraction for chunk {index + 1} of {len(chunks)}")
+        else:
+            results.append(parsed)
+    
+    if not results:
+        return None, False
+    return json.dumps(merge_extraction_results(results), indent=2), len(results) == len(chunks)
+
+def extract_document_content(document_text, document_bytes=None, chunked=None):
     """
     Use AI API to extract content from documents.
     
+    Results are cached on disk, shared across sessions and processes, keyed
+    by the uploaded file bytes, the normalized text, the model name and the
+    prompt version.
+    
+    Documents longer than EXTRACTION_CHUNK_TOKENS are split on paragraph
+    boundaries, each chunk is extracted concurrently and the per-chunk JSON
+    is merged with duplicate names, dates and amounts removed.
+    
     Args:
         document_text (str): The text content of the document
+        document_bytes (bytes, optional): Raw bytes of the uploaded file
+        chunked (bool, optional): Force chunked or single-prompt extraction;
+            by default long documents are chunked
         
     Returns:
         dict: Extracted information from the document
@@ -74,27 +396,46 @@ def extract_document_content(document_text):
         if not model_name:
             return "Error: No suitable AI models available with your API key"
         
-        print(f"Using model: {model_name} for document extraction")
-        model = genai.GenerativeModel(model_name)
-        
-        prompt = f"""
-        Extract key information from the following document:
+        document_text = clean_document_text(document_text)
+        if chunked is None:
+            chunked = count_tokens(document_text) > EXTRACTION_CHUNK_TOKENS
         
-        {document_text}
+        cache = get_cache(EXTRACTION_CACHE)
+        cache_key = make_key(
+            document_bytes or b"",
+            normalize_document_text(document_text),
+            model_name,
+            EXTRACTION_PROMPT_VERSION,
+            EXTRACTION_CHUNK_TOKENS if chunked else 0
+        )
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            print(f"Using cached document extraction ({cache.stats()['hits']} cache hits)")
+            return cached_result
         
-        Identify and structure the following information in a JSON format:
-        - Names of people or organizations
-        - Dates
-        - Addresses
-        - Contact information
-        - Financial information (if present)
-        - Key topics or subjects
-        - Any important statements or claims
-        """
+        print(f"Using model: {model_name} for document extraction")
         
         try:
-            response = model.generate_content(prompt)
-            return response.text
+            if chunked:
+                chunks = split_into_chunks(document_text, EXTRACTION_CHUNK_TOKENS)
+                print(f"Extracting document in {len(chunks)} chunks")
+                result, complete = _extract_chunked(model_name, chunks)
+            else:
+                response = get_client().generate_sync(
+                    model_name,
+                    _extraction_prompt(document_text),
+                    generation_config=json_generation_config(EXTRACTION_SCHEMA)
+                )
+                parsed = _parse_extraction(response.text)
+                result = None if parsed is None else json.dumps(parsed, indent=2)
+                complete = parsed is not None
+            
+            if result is None:
+                # Nothing is cached, so analyzing the document again asks the model again
+                return "Error parsing response: expected a JSON object matching the extraction schema"
+            if complete:
+                cache.set(cache_key, result)
+            return result
         except Exception as api_error:
             error_str = str(api_error)
             if "429" in error_str or "quota" in error_str.lower() or "exhausted" in error_str.lower():
@@ -104,21 +445,36 @@ def extract_document_content(document_text):
                    "extracted_content": "Limited extraction available due to API quota limits."
                 }"""
             else:
+                if is_model_not_found_error(api_error):
+                    clear_model_cache()
                 raise api_error
                 
     except Exception as e:
         return f"Error extracting content: {str(e)}"
 
-def analyze_template(template_text):
+def analyze_template_placeholders(template_text, template_name=None):
     """
-    Use AI API to analyze a template and identify fields.
+    Find the placeholders of a template as they are written in it.
+    
+    [FIELD_NAME] placeholders are found locally without any API call. The AI
+    API is only asked for templates with no recognizable placeholders, and
+    its results are cached on disk by the SHA-256 of the template text, the
+    prompt version and the model name. Only placeholders that occur in the
+    template are kept, so every field returned can be filled.
     
     Args:
         template_text (str): The text content of the template
+        template_name (str, optional): Template name, used to invalidate
+            cached results when the template is saved again
         
     Returns:
-        list: List of fields found in the template
+        dict: Placeholder tokens, such as [CLIENT_NAME] or {{CLIENT_NAME}},
+            mapped to their field names, or an error message string
     """
+    fields = find_template_fields(template_text)
+    if fields:
+        return {f"[{field}]": field for field in fields}
+    
     try:
         # Get preferred model
         model_name = get_preferred_model()
@@ -126,62 +482,74 @@ def analyze_template(template_text):
         if not model_name:
             return "Error: No suitable AI models available with your API key"
         
-        print(f"Using model: {model_name} for template analysis")
-        model = genai.GenerativeModel(model_name)
-        
-        prompt = f"""
-        Analyze the following document template and identify all placeholder fields.
-        
-        Template:
-        {template_text}
+        cache = get_cache(TEMPLATE_ANALYSIS_CACHE)
+        cache_key = make_key(template_text, TEMPLATE_ANALYSIS_PROMPT_VERSION, model_name)
+        tokens = cache.get(cache_key)
         
-        Extract all placeholders that are marked with [FIELD_NAME] format.
-        Return only a Python list of the field names without the brackets.
-        """
-        
-        try:
-            response = model.generate_content(prompt)
+        if tokens is None:
+            print(f"Using model: {model_name} for template analysis")
+            
+            prompt = build_prompt(
+                TEMPLATE_ANALYSIS_INSTRUCTIONS,
+                template_text,
+                TEMPLATE_ANALYSIS_FIELDS,
+                max_tokens=TEMPLATE_ANALYSIS_PROMPT_TOKENS
+            )
             
-            # Process response to extract field names
-            # The response might be in various formats, so we need to handle it properly
             try:
-                # Try to extract a Python list from the response
-                response_text = response.text.strip()
-                
-                # Check if response is wrapped in code blocks
-                if "```" in response_text:
-                    # Extract content between code blocks
-                    code_parts = response_text.split("```")
-                    for part in code_parts:
-                        if part.strip() and not part.strip().startswith("python"):
-                            response_text = part.strip()
-                            break
-                
-                # Clean up the response to get just the field names
-                field_names = []
-                for line in response_text.split('\n'):
-                    line = line.strip()
-                    if line and not line.startswith('[') and not line.startswith('"[') and not line.startswith("'["):
-                        # Remove quotes, brackets, commas
-                        line = line.strip('"\'[] ,')
-                        if line:
-                            field_names.append(line)
-                
-                return field_names
-            except Exception as parsing_error:
-                return f"Error parsing response: {str(parsing_error)}"
-        except Exception as api_error:
-            error_str = str(api_error)
-            if "429" in error_str or "quota" in error_str.lower() or "exhausted" in error_str.lower():
-                # Try to extract fields manually as a fallback
-                print("API quota exhausted, falling back to manual extraction")
-                return extract_fields_manually(template_text)
-            else:
+                response = get_client().generate_sync(
+                    model_name, prompt, generation_config=json_generation_config(TEMPLATE_FIELDS_SCHEMA)
+                )
+            except Exception as api_error:
+                error_str = str(api_error)
+                if "429" in error_str or "quota" in error_str.lower() or "exhausted" in error_str.lower():
+                    # Try to extract fields manually as a fallback
+                    print("API quota exhausted, falling back to manual extraction")
+                    fields = extract_fields_manually(template_text)
+                    if isinstance(fields, str):
+                        return fields
+                    return {f"[{field}]": field for field in fields}
+                if is_model_not_found_error(api_error):
+                    clear_model_cache()
                 raise api_error
             
+            parsed = parse_json_response(response.text)
+            if parsed is None or not matches_schema(parsed, TEMPLATE_FIELDS_SCHEMA):
+                return "Error parsing response: expected a JSON object with a list of fields"
+            
+            # Keep placeholders that occur in the template, first occurrence only
+            tokens = list(dict.fromkeys(
+                token.strip() for token in parsed["fields"]
+                if token.strip() and token.strip() in template_text
+            ))
+            cache.set(cache_key, tokens, tag=template_name)
+        
+        placeholders = {}
+        for token in tokens:
+            field = _TOKEN_DELIMITERS.sub("", token)
+            if field:
+                placeholders[token] = field
+        return placeholders
     except Exception as e:
         return f"Error analyzing template: {str(e)}"
 
+def analyze_template(template_text, template_name=None):
+    """
+    Identify the fields of a template.
+    
+    Args:
+        template_text (str): The text content of the template
+        template_name (str, optional): Template name, used to invalidate
+            cached results when the template is saved again
+        
+    Returns:
+        list: List of fields found in the template, or an error message string
+    """
+    placeholders = analyze_template_placeholders(template_text, template_name)
+    if isinstance(placeholders, str):
+        return placeholders
+    return list(dict.fromkeys(placeholders.values()))
+
 def extract_fields_manually(template_text):
     """
     Extract fields from a template manually when API is unavailable.
@@ -195,30 +563,8 @@ def extract_fields_manually(template_text):
     try:
         print("Extracting fields manually...")
         # Look for patterns like [FIELD_NAME]
-        fields = []
-        start_idx = 0
-        
-        while True:
-            # Find opening bracket
-            open_bracket = template_text.find('[', start_idx)
-            if open_bracket == -1:
-                break
-                
-            # Find closing bracket
-            close_bracket = template_text.find(']', open_bracket)
-            if close_bracket == -1:
-                break
-                
-            # Extract field name
-            field_name = template_text[open_bracket+1:close_bracket]
-            if field_name and field_name not in fields:
-                fields.append(field_name)
-                
-            # Move to next position
-            start_idx = close_bracket + 1
-        
-        return fields
+        return find_template_fields(template_text)
     except Exception as e:
         print(f"Manual extraction failed: {str(e)}")
         # Return a message that will be displayed to the user
-        return "API quota exhausted. Please try again later or update your API key." 
\ No newline at end of file
+        return "API quota exhausted. Please try again later or update your API key."
@@ -0,0 +1,170 @@
+import os
+import csv
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .document_processor import generate_pdf, generate_docx, write_export
+from .docx_template import load_docx_template
+from .template_manager import get_template_path, get_compiled_template, read_template_file, record_template_use
+
+# Records queued per worker process, which bounds memory use for huge inputs
+RECORDS_PER_WORKER = 8
+
+_worker_template = None
+_worker_docx_template = None
+
+def iter_records(records_path):
+    """
+    Read field records from a CSV or JSONL file one at a time.
+
+    Args:
+        records_path (str): Path to a .csv file with a header row, or a
+            .jsonl file with one JSON object per line
+
+    Yields:
+        tuple: (record_number, record, error) where record is a dict, or
+            None with an error message when the line could not be parsed
+    """
+    path = Path(records_path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline='') as file:
+            for number, record in enumerate(csv.DictReader(file), start=1):
+                yield number, record, None
+        return
+
+    with open(path, 'r') as file:
+        number = 0
+        for line in file:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {str(e)}"
+                continue
+            if isinstance(record, dict):
+                yield number, record, None
+            else:
+                yield number, None, "Record is not a JSON object"
+
+def _init_worker(compiled_template, docx_content=None):
+    """Worker initializer: receive the compiled template once instead of with every record."""
+    global _worker_template, _worker_docx_template
+    _worker_template = compiled_template
+    _worker_docx_template = load_docx_template(docx_content) if docx_content else None
+
+def _render_record(number, record, output_path, export_format):
+    """
+    Worker task: fill the template with one record and write the document.
+
+    Returns:
+        tuple: (record_number, output_path, error message or None)
+    """
+    try:
+        values = {field: "" if value is None else str(value) for field, value in record.items()}
+        if export_format == "docx" and _worker_docx_template is not None:
+            # Fill the Word template itself, keeping its formatting
+            if not write_export(_worker_docx_template.render(values), output_path):
+                return number, output_path, "DOCX write failed"
+            return number, output_path, None
+        filled_content = _worker_template.render(values)
+        if export_format == "pdf":
+            success = generate_pdf(filled_content, output_path)
+        else:
+            success = generate_docx(filled_content, output_path)
+        if not success:
+            return number, output_path, f"{export_format.upper()} generation failed"
+        return number, output_path, None
+    except Exception as e:
+        return number, output_path, str(e)
+
+def _output_name(number, record, name_field):
+    """File name (without extension) for a record."""
+    if name_field and record.get(name_field):
+        safe_name = "".join(c if c.isalnum() or c in "-_ ." else "_" for c in str(record[name_field]))
+        return f"{number:06d}_{safe_name.strip()}"
+    return f"{number:06d}"
+
+def run_batch(template_name, records_path, output_dir, export_format="pdf",
+              workers=None, name_field=None, progress_every=100):
+    """
+    Render every record of a records file with a template.
+
+    Records are rendered across a pool of processes. Only a few records per
+    worker are in flight at any time, so memory stays flat no matter how
+    large the input is. Failed records are written to failures.jsonl in the
+    output directory.
+
+    Args:
+        template_name (str): Name of the template to fill
+        records_path (str): CSV or JSONL file of field records
+        output_dir (str): Directory for the generated documents
+        export_format (str): "pdf" or "docx"
+        workers (int, optional): Number of worker processes, one per CPU by default
+        name_field (str, optional): Record field used in output file names
+        progress_every (int): Print progress after this many records
+
+    Returns:
+        dict: Counts of rendered and failed records, and elapsed seconds
+    """
+    export_format = export_format.lower()
+    if export_format not in ("pdf", "docx"):
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    template_path = get_template_path(template_name)
+    compiled_template = get_compiled_template(template_path)
+    docx_content = None
+    if export_format == "docx" and template_path.endswith(".docx"):
+        docx_content = read_template_file(template_path)
+    record_template_use(template_name)
+
+    output_dir = Path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * RECORDS_PER_WORKER
+
+    start_time = time.time()
+    done = 0
+    failed = 0
+
+    with open(output_dir / "failures.jsonl", 'w') as failure_log, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(compiled_template, docx_content)) as executor:
+
+        def log_failure(number, error):
+            failure_log.write(json.dumps({"record": number, "error": error}) + "\n")
+
+        def collect(finished):
+            nonlocal done, failed
+            for future in finished:
+                number, _, error = future.result()
+                done += 1
+                if error:
+                    failed += 1
+                    log_failure(number, error)
+                if done % progress_every == 0:
+                    rate = done / max(time.time() - start_time, 1e-9)
+                    print(f"Processed {done} records ({failed} failed, {rate:.1f} records/s)")
+
+        pending = set()
+        for number, record, error in iter_records(records_path):
+            if error:
+                done += 1
+                failed += 1
+                log_failure(number, error)
+                continue
+            output_path = output_dir / f"{_output_name(number, record, name_field)}.{export_format}"
+            pending.add(executor.submit(_render_record, number, record, str(output_path), export_format))
+            if len(pending) >= max_pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+
+        finished, _ = wait(pending)
+        collect(finished)
+
+    elapsed = time.time() - start_time
+    print(f"Finished {done} records in {elapsed:.1f}s: {done - failed} rendered, {failed} failed")
+    return {"rendered": done - failed, "failed": failed, "elapsed": elapsed}
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Local cache directory shared by every process running the app
+CACHE_DIR = Path(os.getenv("CACHE_DIR", ".cache"))
+
+# Names of the app's caches
+TEMPLATE_ANALYSIS_CACHE = "template_analysis"
+EXTRACTION_CACHE = "extraction"
+EXPORT_CACHE = "export"
+TEMPLATE_INDEX_CACHE = "template_index"
+
+# Default limits for the app's named caches
+CACHE_DEFAULTS = {
+    TEMPLATE_ANALYSIS_CACHE: {"max_entries": 500, "max_bytes": 5 * 1024 * 1024},
+    EXTRACTION_CACHE: {"max_entries": 2000, "max_bytes": 50 * 1024 * 1024, "ttl": 7 * 24 * 3600},
+    EXPORT_CACHE: {"max_entries": 200, "max_bytes": 200 * 1024 * 1024},
+    TEMPLATE_INDEX_CACHE: {"max_entries": 1000, "max_bytes": 50 * 1024 * 1024},
+}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def make_key(*parts):
+    """
+    Build a cache key from several parts.
+
+    Args:
+        *parts: Strings or bytes that together identify a cached value
+
+    Returns:
+        str: SHA-256 hex digest of the parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = str(part).encode("utf-8")
+        # Length prefix so ("ab", "c") and ("a", "bc") give different keys
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+def _env_number(name, default, cast=int):
+    """Read an optional numeric setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return cast(value)
+
+class DiskCache:
+    """
+    A persistent key-value cache stored in SQLite.
+
+    Entries are shared by every session and process that opens a cache with
+    the same name. Least recently used entries are evicted once the cache
+    grows past max_entries or max_bytes, and entries older than ttl seconds
+    are treated as missing. Values are bytes or anything JSON-serializable.
+
+    Limits default to the environment variables <NAME>_CACHE_MAX_ENTRIES,
+    <NAME>_CACHE_MAX_BYTES and <NAME>_CACHE_TTL.
+    """
+
+    def __init__(self, name, max_entries=1000, max_bytes=None, ttl=None, cache_dir=None):
+        prefix = name.upper()
+        self.name = name
+        self.max_entries = _env_number(f"{prefix}_CACHE_MAX_ENTRIES", max_entries)
+        self.max_bytes = _env_number(f"{prefix}_CACHE_MAX_BYTES", max_bytes)
+        self.ttl = _env_number(f"{prefix}_CACHE_TTL", ttl, float)
+        self.path = Path(cache_dir or CACHE_DIR) / f"{name}.sqlite3"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        """Open a connection, creating the cache table on first use."""
+        if not self._initialized:
+            os.makedirs(self.path.parent, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB, is_json INTEGER, size INTEGER, "
+                "tag TEXT, created_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _count(self, hit):
+        """Update the hit/miss counters."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        """
+        Get a cached value.
+
+        Args:
+            key (str): Cache key
+            default: Value to return when the key is missing or expired
+
+        Returns:
+            The cached value, or default
+        """
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, is_json, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                now = time.time()
+                if row is not None and self.ttl is not None and now - row[2] > self.ttl:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                    row = None
+                if row is None:
+                    self._count(False)
+                    return default
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error reading {self.name} cache: {str(e)}")
+            self._count(False)
+            return default
+
+        self._count(True)
+        value, is_json = row[0], row[1]
+        return json.loads(value) if is_json else bytes(value)
+
+    def set(self, key, value, tag=None):
+        """
+        Store a value and evict old entries if the cache is over its limits.
+
+        Args:
+            key (str): Cache key
+            value: Bytes or a JSON-serializable value
+            tag (str, optional): Label used to invalidate related entries together
+
+        Returns:
+            bool: Success status
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            blob, is_json = bytes(value), 0
+        else:
+            blob, is_json = json.dumps(value).encode("utf-8"), 1
+
+        if self.max_bytes is not None and len(blob) > self.max_bytes:
+            return False
+
+        try:
+            conn = self._connect()
+            try:
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(blob), is_json, len(blob), tag, now, now)
+                )
+                self._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error writing {self.name} cache: {str(e)}")
+            return False
+
+    def _evict(self, conn):
+        """Delete least recently used entries until the cache fits its limits."""
+        if self.max_entries is not None:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+                stale_keys = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale_keys.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", stale_keys)
+
+    def delete(self, key):
+        """Remove a single entry."""
+        self._execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def invalidate_tag(self, tag):
+        """Remove every entry stored with the given tag."""
+        self._execute("DELETE FROM entries WHERE tag = ?", (tag,))
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        self._execute("DELETE FROM entries")
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _execute(self, sql, params=()):
+        """Run a write statement, logging rather than raising on failure."""
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(sql, params)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error updating {self.name} cache: {str(e)}")
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hit and miss counts for this process, plus entry count and size
+        """
+        entries, size = 0, 0
+        try:
+            conn = self._connect()
+            try:
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error reading {self.name} cache: {str(e)}")
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+def get_cache(name):
+    """
+    Get the process-wide cache with the given name, creating it on first use.
+
+    Args:
+        name (str): Cache name, also used for the file name and settings
+
+    Returns:
+        DiskCache: The shared cache instance
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = DiskCache(name, **CACHE_DEFAULTS.get(name, {}))
+        return _caches[name]
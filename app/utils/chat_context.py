@@ -0,0 +1,210 @@
+import os
+import hashlib
+from dotenv import load_dotenv
+
+from .prompts import CHAT_PROMPT_TOKENS, build_prompt, compact, count_tokens, truncate_to_tokens
+from .retrieval import RETRIEVAL_TOP_K, get_document_index
+
+load_dotenv()
+
+# Turns (a question and its answer) kept verbatim; older turns are summarized
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "4"))
+
+# Token budgets for the document context and the summary of older turns.
+# The whole prompt never exceeds CHAT_PROMPT_TOKENS.
+CHAT_DOCUMENT_TOKENS = int(os.getenv("CHAT_DOCUMENT_TOKENS", "4000"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+
+# Questions longer than this share of the ceiling are truncated
+_QUESTION_SHARE = 4
+
+# Smallest part of a long turn worth including in a prompt
+_MIN_PARTIAL_TURN_TOKENS = 50
+
+# Characters of each question and answer kept by the local summary
+_LOCAL_SUMMARY_CHARS = 200
+
+def _clip(text, max_chars=_LOCAL_SUMMARY_CHARS):
+    """Shorten text to one line of at most max_chars characters."""
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+def local_summary(summary, turns, max_tokens):
+    """
+    Summarize turns without calling the model.
+
+    Each turn becomes one line with the start of the question and the
+    answer. The oldest lines are dropped to fit max_tokens.
+
+    Args:
+        summary (str): Summary of earlier turns
+        turns (list): (question, answer) pairs to add
+        max_tokens (int): Token budget for the summary
+
+    Returns:
+        str: The updated summary
+    """
+    lines = summary.splitlines() if summary else []
+    lines.extend(f"- User: {_clip(question)} Assistant: {_clip(answer)}" for question, answer in turns)
+    while lines and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+class ChatContext:
+    """
+    Conversation state for the AI Assistant.
+
+    Prompts are laid out as a prefix with the instructions and the current
+    document, which stays identical from turn to turn, followed by a summary
+    of older turns, the most recent turns verbatim and the new question. The
+    prefix is built once per document, and every prompt fits max_tokens.
+
+    Documents too long for the document budget are not sent whole: the
+    chunks of the document most relevant to each question are retrieved
+    from a local BM25 index and sent instead.
+    """
+
+    def __init__(self, instructions, summarizer=None, max_turns=None, max_tokens=None,
+                 document_tokens=None, summary_tokens=None):
+        """
+        Args:
+            instructions (str): Instructions placed before the document
+            summarizer (callable, optional): summarizer(summary, turns, max_tokens)
+                returning the updated summary; local_summary is used if it is
+                missing or fails
+            max_turns (int, optional): Turns kept verbatim
+            max_tokens (int, optional): Hard ceiling for each prompt
+            document_tokens (int, optional): Token budget for the document prefix
+            summary_tokens (int, optional): Token budget for the summary
+        """
+        self.instructions = instructions
+        self.summarizer = summarizer
+        self.max_turns = CHAT_HISTORY_TURNS if max_turns is None else max_turns
+        self.max_tokens = CHAT_PROMPT_TOKENS if max_tokens is None else max_tokens
+        self.summary_tokens = CHAT_SUMMARY_TOKENS if summary_tokens is None else summary_tokens
+        self.question_tokens = self.max_tokens // _QUESTION_SHARE
+        document_tokens = CHAT_DOCUMENT_TOKENS if document_tokens is None else document_tokens
+        # Leave room for the summary, the question and the section labels
+        self.document_tokens = max(0, min(
+            document_tokens, self.max_tokens - self.summary_tokens - self.question_tokens - 50
+        ))
+        self.turns = []
+        self.summary = ""
+        self._prefix = None
+        self._document_key = None
+        self._index = None
+        self._retrieve = False
+
+    def set_document(self, document_text):
+        """
+        Set the document the conversation is about.
+
+        The prefix and the document index are only rebuilt when the
+        document changes.
+
+        Args:
+            document_text (str): Content of the current document, or ""
+        """
+        document_text = document_text or ""
+        document_key = hashlib.sha256(document_text.encode("utf-8")).hexdigest()
+        if document_key == self._document_key:
+            return
+        self._index = get_document_index(document_text)
+        prefix = build_prompt(self.instructions, document_text or "(none)")
+        self._retrieve = count_tokens(prefix) > self.document_tokens
+        if self._retrieve:
+            prefix = build_prompt(
+                self.instructions, "(The document is long. Excerpts relevant to the query are given below.)"
+            )
+        self._prefix = prefix
+        self._document_key = document_key
+
+    def lookup(self, question):
+        """
+        Answer a question about a single document field without the model.
+
+        Args:
+            question (str): The user's question
+
+        Returns:
+            str: The answer, or None if the model is needed
+        """
+        if self._index is None:
+            return None
+        return self._index.lookup(question)
+
+    def build_prompt(self, question):
+        """
+        Build the prompt for a new question.
+
+        Recent turns are added newest first until the ceiling is reached;
+        turns left out are still rolled into the summary later.
+
+        Args:
+            question (str): The user's question
+
+        Returns:
+            str: The prompt
+        """
+        if self._prefix is None:
+            self.set_document("")
+        parts = [self._prefix]
+        if self._retrieve:
+            # Fall back to the start of the document when no chunk matches
+            excerpts = self._index.excerpts(question) or self._index.chunks[:RETRIEVAL_TOP_K]
+            budget = max(0, self.document_tokens - count_tokens(self._prefix))
+            parts.append("Document excerpts:\n" + truncate_to_tokens("\n[...]\n".join(excerpts), budget))
+        # Turns past max_turns that are not summarized yet get a local summary line
+        pending = self.turns[:len(self.turns) - self.max_turns]
+        summary = local_summary(self.summary, pending, self.summary_tokens) if pending else self.summary
+        if summary:
+            parts.append(f"Summary of the earlier conversation:\n{summary}")
+        query = f"User query: {truncate_to_tokens(question, self.question_tokens)}"
+
+        used = count_tokens("\n\n".join(parts + [query]))
+        recent = []
+        for question_text, answer in reversed(self.turns[len(pending):]):
+            turn = f"User: {question_text}\nAssistant: {answer}"
+            cost = count_tokens(turn) + 1
+            if used + cost > self.max_tokens - 10:
+                # Keep the start of a turn that is too long to fit whole
+                remaining = self.max_tokens - 10 - used - 1
+                if remaining >= _MIN_PARTIAL_TURN_TOKENS:
+                    recent.insert(0, truncate_to_tokens(turn, remaining))
+                break
+            recent.insert(0, turn)
+            used += cost
+        if recent:
+            parts.append("Recent conversation:\n" + "\n".join(recent))
+        return "\n\n".join(parts + [query])
+
+    def add_turn(self, question, answer):
+        """
+        Record a question and its answer, summarizing turns beyond max_turns.
+
+        Older turns are summarized in batches of max_turns, so the summarizer
+        is called once every max_turns questions instead of on every one.
+        Until then, build_prompt covers them with a local summary.
+
+        Args:
+            question (str): The user's question
+            answer (str): The assistant's answer
+        """
+        self.turns.append((question, answer))
+        if len(self.turns) < self.max_turns + max(self.max_turns, 1):
+            return
+        overflow = self.turns[:len(self.turns) - self.max_turns]
+        self.turns = self.turns[len(overflow):]
+        self.summary = self._summarize(overflow)
+
+    def _summarize(self, turns):
+        """Roll turns into the summary, falling back to the local summary."""
+        if self.summarizer is not None:
+            try:
+                summary = compact(self.summarizer(self.summary, turns, self.summary_tokens))
+                if summary:
+                    return truncate_to_tokens(summary, self.summary_tokens)
+            except Exception as e:
+                print(f"Error summarizing chat history: {str(e)}")
+        return local_summary(self.summary, turns, self.summary_tokens)
+
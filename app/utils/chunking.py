@@ -0,0 +1,117 @@
+import re
+import json
+
+# Rough number of characters per model token for English text
+CHARS_PER_TOKEN = 4
+
+# Separator between the pages of extracted PDF text
+PAGE_BREAK = "\n\f\n"
+
+# Boundaries tried in order when a piece of text is too large for a chunk:
+# page breaks, blank lines, line breaks, then spaces
+_SEPARATORS = [
+    re.compile(r"\f"),
+    re.compile(r"\n\s*\n"),
+    re.compile(r"\n"),
+    re.compile(r" "),
+]
+
+def estimate_tokens(text):
+    """
+    Estimate the number of model tokens in a text without calling the API.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _split_units(text, max_chars, level=0):
+    """Split text into pieces of at most max_chars, on the coarsest boundary possible."""
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_SEPARATORS):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    units = []
+    for piece in _SEPARATORS[level].split(text):
+        if piece.strip():
+            units.extend(_split_units(piece, max_chars, level + 1))
+    return units
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split a document into chunks that each fit a token budget.
+
+    Text is cut on page boundaries (form feeds) or paragraph boundaries
+    where possible, falling back to lines and words for very long
+    paragraphs. Consecutive pieces are packed together up to the budget.
+
+    Args:
+        text (str): Document text
+        max_tokens (int): Maximum estimated tokens per chunk
+
+    Returns:
+        list: Chunk texts in document order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_len = 0
+    for unit in _split_units(text, max_chars):
+        if current and current_len + len(unit) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+        current.append(unit)
+        current_len += len(unit) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _dedupe_key(value):
+    """Key used to recognize duplicate values across chunks."""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return json.dumps(value, sort_keys=True)
+
+def _merge_values(existing, new):
+    """Merge two values found under the same key in different chunks."""
+    if isinstance(existing, dict) and isinstance(new, dict):
+        return merge_extraction_results([existing, new])
+    if existing in (None, "", [], {}):
+        return new
+    if new in (None, "", [], {}):
+        return existing
+    existing_items = existing if isinstance(existing, list) else [existing]
+    new_items = new if isinstance(new, list) else [new]
+    merged = []
+    seen = set()
+    for item in existing_items + new_items:
+        key = _dedupe_key(item)
+        if key not in seen:
+            seen.add(key)
+            merged.append(item)
+    if len(merged) == 1 and not isinstance(existing, list):
+        return merged[0]
+    return merged
+
+def merge_extraction_results(results):
+    """
+    Merge the JSON extracted from each chunk into one result.
+
+    Lists are concatenated without duplicates (compared case- and
+    whitespace-insensitively for strings), nested objects are merged key by
+    key, and differing scalar values are collected into a list.
+
+    Args:
+        results (list): Parsed JSON objects, one per chunk
+
+    Returns:
+        dict: The merged result
+    """
+    merged = {}
+    for result in results:
+        for key, value in result.items():
+            merged[key] = _merge_values(merged[key], value) if key in merged else value
+    return merged
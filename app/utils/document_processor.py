@@ -1,47 +1,307 @@
 import os
+import math
 import PyPDF2
 import docx
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import io
+import re
+import json
+import zipfile
+import threading
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
 
-def read_pdf(file_path):
+from .template_engine import compile_template
+from .chunking import PAGE_BREAK
+from .pdf_layout import layout_text, draw_pages, PDF_FONT, PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN
+from .cache import EXPORT_CACHE, get_cache, make_key
+from .docx_template import load_docx_template
+
+load_dotenv()
+
+# PDFs with at least this many pages are parsed by a pool of processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+# Worker processes for PDF parsing (0 means one per CPU)
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", "0")) or os.cpu_count() or 1
+# Contiguous page ranges per worker. Every task parses the whole file
+# again before extracting its pages, so tasks are few and large.
+PDF_TASKS_PER_WORKER = int(os.getenv("PDF_TASKS_PER_WORKER", "1"))
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+# Bump when rendered exports change, so cached renders are not reused
+EXPORT_RENDER_VERSION = "1"
+
+# Background thread that saves exports to disk
+_export_writer = None
+_export_writer_lock = threading.Lock()
+
+# WordprocessingML tags used by the streaming DOCX reader
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+# Subtrees without document text: alternate content, and paragraph and run
+# properties, whose w:tabs hold tab stop definitions rather than tab characters
+_DOCX_SKIPPED = frozenset([_MC_FALLBACK, _W + "pPr", _W + "rPr"])
+_DOCX_HEADER_PART = re.compile(r"word/header\d*\.xml$")
+_DOCX_FOOTER_PART = re.compile(r"word/footer\d*\.xml$")
+
+def _iter_reader_pages(pdf_reader, start_page=1, end_page=None, max_chars=None):
+    """Extract text one page at a time from an open PdfReader."""
+    remaining = max_chars
+    page_count = len(pdf_reader.pages)
+    last_page = page_count if end_page is None else min(end_page, page_count)
+    for page_number in range(max(start_page, 1), last_page + 1):
+        if remaining is not None and remaining <= 0:
+            break
+        page_text = pdf_reader.pages[page_number - 1].extract_text() or ""
+        if remaining is not None:
+            page_text = page_text[:remaining]
+            remaining -= len(page_text)
+        yield page_number, page_text
+
+def iter_pdf_pages(file_path, start_page=1, end_page=None, max_chars=None):
+    """
+    Extract text from a PDF file one page at a time.
+    
+    Pages are parsed lazily, so callers can start working on the first page
+    before later pages are read.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        start_page (int): First page to extract, counting from 1
+        end_page (int, optional): Last page to extract, inclusive
+        max_chars (int, optional): Stop once this many characters were yielded
+        
+    Yields:
+        tuple: (page_number, text) for each page
+    """
+    with open(file_path, 'rb') as file:
+        yield from _iter_reader_pages(PyPDF2.PdfReader(file), start_page, end_page, max_chars)
+
+def count_pdf_pages(file_path):
+    """
+    Count the pages of a PDF file without extracting any text.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        
+    Returns:
+        int: Number of pages
+    """
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def _extract_pdf_page_range(file_path, start_page, end_page):
+    """Worker task: open the PDF independently and extract a range of pages."""
+    return list(iter_pdf_pages(file_path, start_page, end_page))
+
+def _get_pdf_pool():
+    """Get the shared process pool for PDF parsing, starting it on first use."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Forking a process that runs other threads (the LLM event loop,
+            # the export writer) can deadlock the child, so workers are spawned
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+def iter_pdf_pages_parallel(file_path, start_page=1, end_page=None, pages_per_task=None, page_count=None):
+    """
+    Extract text from a PDF file using a pool of worker processes.
+    
+    The page range is split into PDF_TASKS_PER_WORKER contiguous shards per
+    worker, each parsed from its own copy of the file. Pages are yielded in
+    order as soon as their shard and all earlier shards are done.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        start_page (int): First page to extract, counting from 1
+        end_page (int, optional): Last page to extract, inclusive
+        pages_per_task (int, optional): Pages per worker task, by default
+            the range divided evenly between the tasks
+        page_count (int, optional): Number of pages, if already known
+        
+    Yields:
+        tuple: (page_number, text) for each page
+    """
+    if page_count is None:
+        page_count = count_pdf_pages(file_path)
+    last_page = page_count if end_page is None else min(end_page, page_count)
+    first_page = max(start_page, 1)
+    page_total = max(last_page - first_page + 1, 1)
+    step = pages_per_task or math.ceil(page_total / (PDF_MAX_WORKERS * PDF_TASKS_PER_WORKER))
+    first_pages = range(first_page, last_page + 1, step)
+    
+    pool = _get_pdf_pool()
+    futures = [
+        pool.submit(_extract_pdf_page_range, file_path, first, min(first + step - 1, last_page))
+        for first in first_pages
+    ]
+    for future in futures:
+        yield from future.result()
+
+def read_pdf(file_path, start_page=1, end_page=None, max_chars=None, parallel=None):
     """
     Extract text from a PDF file.
     
+    Large files are parsed by a pool of processes, small ones on the calling
+    thread so they don't pay the pool startup cost. With a single worker
+    the file is always parsed on the calling thread.
+    
     Args:
         file_path (str): Path to the PDF file
+        start_page (int): First page to extract, counting from 1
+        end_page (int, optional): Last page to extract, inclusive
+        max_chars (int, optional): Maximum number of characters to extract
+        parallel (bool, optional): Force parallel or serial parsing; by default
+            files with at least PDF_PARALLEL_MIN_PAGES pages are parsed in parallel
         
     Returns:
         str: Extracted text from the PDF
     """
-    text = ""
     try:
+        # The reader that counts the pages also extracts them when parsing serially
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text()
-        return text
+            page_count = len(pdf_reader.pages)
+            if max_chars is not None or PDF_MAX_WORKERS <= 1:
+                # A character budget is consumed in page order, and a single
+                # worker would only add the cost of parsing the file again
+                parallel = False
+            elif parallel is None:
+                parallel = page_count >= PDF_PARALLEL_MIN_PAGES
+            
+            if parallel:
+                pages = iter_pdf_pages_parallel(file_path, start_page, end_page, page_count=page_count)
+            else:
+                pages = _iter_reader_pages(pdf_reader, start_page, end_page, max_chars)
+            # Form feeds between pages let chunking and prompt cleanup find page boundaries
+            return PAGE_BREAK.join(page_text for _, page_text in pages)
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
-def read_docx(file_path):
+def _iter_docx_part_text(part):
+    """
+    Stream the text blocks of one WordprocessingML part.
+    
+    Paragraphs are yielded one per block and table rows as their cell texts
+    joined by tabs. Elements are dropped from the tree as soon as they are
+    processed, so memory use does not grow with the size of the part.
+    
+    Args:
+        part: File object of an XML part inside the DOCX zip
+        
+    Yields:
+        str: Text of each paragraph or table row in document order
+    """
+    parents = []
+    paragraphs = []
+    rows = []
+    cells = []
+    skip_depth = 0
+    
+    for event, elem in ET.iterparse(part, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            parents.append(elem)
+            if tag in _DOCX_SKIPPED:
+                # Alternate content repeats the text of the preferred choice
+                skip_depth += 1
+            elif skip_depth:
+                pass
+            elif tag == _W + "p":
+                paragraphs.append([])
+            elif tag == _W + "tr":
+                rows.append([])
+            elif tag == _W + "tc":
+                cells.append([])
+            continue
+        
+        parents.pop()
+        if tag in _DOCX_SKIPPED:
+            skip_depth -= 1
+        elif skip_depth:
+            pass
+        elif tag == _W + "t" and paragraphs:
+            paragraphs[-1].append(elem.text or "")
+        elif tag == _W + "tab" and paragraphs:
+            paragraphs[-1].append("\t")
+        elif tag in (_W + "br", _W + "cr") and paragraphs:
+            if elem.get(_W + "type") != "page":
+                paragraphs[-1].append("\n")
+        elif tag == _W + "p":
+            text = "".join(paragraphs.pop())
+            if cells:
+                cells[-1].append(text)
+            elif paragraphs:
+                # A text box paragraph nested inside another paragraph
+                paragraphs[-1].append(text)
+            else:
+                yield text
+        elif tag == _W + "tc":
+            cell_text = " ".join(text for text in cells.pop() if text)
+            if rows:
+                rows[-1].append(cell_text)
+        elif tag == _W + "tr":
+            row_text = "\t".join(rows.pop())
+            if cells:
+                # A row of a table nested inside a cell
+                cells[-1].append(row_text)
+            else:
+                yield row_text
+        
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+def iter_docx_text(file_path, include_headers_footers=True):
+    """
+    Extract text from a DOCX file one block at a time.
+    
+    Reads the XML parts straight from the zip with an incremental parser
+    instead of building the python-docx object model, and covers tables as
+    well as paragraphs.
+    
+    Args:
+        file_path (str): Path to the DOCX file
+        include_headers_footers (bool): Also yield header text first and
+            footer text last
+        
+    Yields:
+        str: Text of each paragraph or table row
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        names = archive.namelist()
+        parts = ["word/document.xml"]
+        if include_headers_footers:
+            headers = sorted(name for name in names if _DOCX_HEADER_PART.match(name))
+            footers = sorted(name for name in names if _DOCX_FOOTER_PART.match(name))
+            parts = headers + parts + footers
+        for name in parts:
+            with archive.open(name) as part:
+                yield from _iter_docx_part_text(part)
+
+def read_docx(file_path, include_headers_footers=True):
     """
     Extract text from a DOCX file.
     
     Args:
         file_path (str): Path to the DOCX file
+        include_headers_footers (bool): Include header and footer text
         
     Returns:
         str: Extracted text from the DOCX
     """
-    text = ""
     try:
-        doc = docx.Document(file_path)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+        return "".join(
+            f"{text}\n" for text in iter_docx_text(file_path, include_headers_footers)
+        )
     except Exception as e:
         return f"Error reading DOCX: {str(e)}"
 
@@ -51,6 +311,9 @@ def fill_template(template_text, data):
     """
     Fill a template with data.
     
+    The template is compiled once per content and rendered in a single pass,
+    so values containing [FIELD_NAME] text are inserted as-is.
+    
     Args:
         template_text (str): The text content of the template
         data (dict): A dictionary with field names and values
@@ -58,68 +321,44 @@ def fill_template(template_text, data):
     Returns:
         str: Filled template
     """
-    filled_template = template_text
-    for field, value in data.items():
-        placeholder = f"[{field}]"
-        filled_template = filled_template.replace(placeholder, value)
-    return filled_template
+    return compile_template(template_text).render(data)
 
-def generate_pdf(text, output_path):
+def render_pdf(text):
     """
-    Generate a PDF from text.
+    Render text as a PDF in memory.
+    
+    Long lines are wrapped to the page width, and paragraphs split across
+    pages keep at least two lines on each page.
     
     Args:
         text (str): Text to include in the PDF
-        output_path (str): Path to save the PDF
         
     Returns:
-        bool: Success status
+        bytes: The PDF file, or None if rendering failed
     """
     try:
         packet = io.BytesIO()
         c = canvas.Canvas(packet, pagesize=letter)
         
-        # Set up text formatting
-        c.setFont("Helvetica", 12)
-        
-        # Calculate page width and height
-        width, height = letter
-        
-        # Start at the top of the page
-        y_position = height - 50
-        
-        # Split text into lines and write to PDF
-        for line in text.split('\n'):
-            if y_position < 50:  # Create a new page if we're at the bottom
-                c.showPage()
-                c.setFont("Helvetica", 12)
-                y_position = height - 50
-            
-            c.drawString(50, y_position, line)
-            y_position -= 15
+        # Wrap lines and work out page breaks before drawing anything
+        pages = layout_text(text, page_size=letter)
+        draw_pages(c, pages, page_size=letter)
         
         c.save()
-        
-        # Get the value of the BytesIO buffer and write it to a file
-        packet.seek(0)
-        with open(output_path, 'wb') as f:
-            f.write(packet.getvalue())
-            
-        return True
+        return packet.getvalue()
     except Exception as e:
         print(f"Error generating PDF: {str(e)}")
-        return False
+        return None
 
-def generate_docx(text, output_path):
+def render_docx(text):
     """
-    Generate a DOCX from text.
+    Render text as a DOCX in memory.
     
     Args:
         text (str): Text to include in the DOCX
-        output_path (str): Path to save the DOCX
         
     Returns:
-        bool: Success status
+        bytes: The DOCX file, or None if rendering failed
     """
     try:
         doc = docx.Document()
@@ -128,8 +367,147 @@ def generate_docx(text, output_path):
         for paragraph in text.split('\n'):
             doc.add_paragraph(paragraph)
         
-        doc.save(output_path)
-        return True
+        packet = io.BytesIO()
+        doc.save(packet)
+        return packet.getvalue()
     except Exception as e:
         print(f"Error generating DOCX: {str(e)}")
-        return False 
\ No newline at end of file
+        return None
+
+def _render_options(export_format):
+    """Settings that affect the rendered file, as part of the export cache key."""
+    if export_format == "pdf":
+        return (letter, PDF_FONT, PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN)
+    return ()
+
+def _fill_docx_template(template_content, data):
+    """Fill a DOCX template in memory, or return None if filling failed."""
+    try:
+        return load_docx_template(template_content).render(data)
+    except Exception as e:
+        print(f"Error filling DOCX template: {str(e)}")
+        return None
+
+def export_document(text, export_format, template_path=None, data=None):
+    """
+    Render text as a PDF or DOCX, reusing an identical earlier render.
+    
+    DOCX exports of a .docx template are filled from the template itself,
+    keeping its formatting, instead of being rebuilt from text. Rendered
+    files are cached by the hash of their inputs, the format and the render
+    settings, and shared by every session.
+    
+    Args:
+        text (str): Text to include in the document
+        export_format (str): "pdf" or "docx"
+        template_path (str, optional): Template the text was filled from
+        data (dict, optional): Field values the text was filled with
+        
+    Returns:
+        bytes: The file, or None if rendering failed
+    """
+    export_format = export_format.lower()
+    renderers = {"pdf": render_pdf, "docx": render_docx}
+    if export_format not in renderers:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    
+    native_docx = (
+        export_format == "docx" and data is not None
+        and template_path is not None and str(template_path).endswith(".docx")
+    )
+    if native_docx:
+        # Imported here because template_manager imports this module
+        from .template_manager import read_template_file
+        template_content = read_template_file(template_path)
+        cache_key = make_key(
+            template_content, json.dumps(data, sort_keys=True), "docx-template", EXPORT_RENDER_VERSION
+        )
+    else:
+        cache_key = make_key(text, export_format, EXPORT_RENDER_VERSION, *_render_options(export_format))
+    
+    cache = get_cache(EXPORT_CACHE)
+    rendered = cache.get(cache_key)
+    if rendered is not None:
+        return rendered
+    
+    if native_docx:
+        rendered = _fill_docx_template(template_content, data)
+    else:
+        rendered = renderers[export_format](text)
+    if rendered is not None:
+        cache.set(cache_key, rendered)
+    return rendered
+
+def write_export(data, output_path):
+    """
+    Write an exported document to disk atomically.
+    
+    Args:
+        data (bytes): File content
+        output_path (str): Path to save the file
+        
+    Returns:
+        bool: Success status
+    """
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, output_path)
+        return True
+    except OSError as e:
+        print(f"Error saving export to {output_path}: {str(e)}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+def _get_export_writer():
+    """Get the background thread that saves exports, starting it on first use."""
+    global _export_writer
+    with _export_writer_lock:
+        if _export_writer is None:
+            _export_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export-writer")
+        return _export_writer
+
+def save_export_async(data, output_path):
+    """
+    Save an exported document to disk in the background.
+    
+    Args:
+        data (bytes): File content
+        output_path (str): Path to save the file
+        
+    Returns:
+        Future: Resolves to the success status of write_export
+    """
+    return _get_export_writer().submit(write_export, data, output_path)
+
+def generate_pdf(text, output_path):
+    """
+    Generate a PDF from text and save it.
+    
+    Args:
+        text (str): Text to include in the PDF
+        output_path (str): Path to save the PDF
+        
+    Returns:
+        bool: Success status
+    """
+    data = render_pdf(text)
+    return data is not None and write_export(data, output_path)
+
+def generate_docx(text, output_path):
+    """
+    Generate a DOCX from text and save it.
+    
+    Args:
+        text (str): Text to include in the DOCX
+        output_path (str): Path to save the DOCX
+        
+    Returns:
+        bool: Success status
+    """
+    data = render_docx(text)
+    return data is not None and write_export(data, output_path)
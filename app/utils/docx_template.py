@@ -0,0 +1,297 @@
+import io
+import re
+import html
+import zlib
+import struct
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from .template_engine import PLACEHOLDER_PATTERN, CompiledTemplate
+
+# Number of parsed DOCX templates kept in memory
+DOCX_TEMPLATE_CACHE_SIZE = 32
+
+# Parts of a DOCX package whose text can hold placeholders
+_TEXT_PART = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+_WORDPROCESSING_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_NS_PREFIX = re.compile(r'xmlns:(\w+)="' + re.escape(_WORDPROCESSING_NS) + '"')
+
+# Zip record layouts: local file header, central directory header, end of
+# central directory, and the name and extra field lengths of a local header
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_LOCAL_HEADER_LENGTHS = struct.Struct("<HH")
+
+_docx_cache = OrderedDict()
+_docx_cache_lock = threading.Lock()
+
+class _ZipEntry:
+    """One file of a zip package, kept compressed as it was read."""
+
+    def __init__(self, name, flags, method, dos_time, dos_date, crc, size, raw, external_attr):
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.crc = crc
+        self.size = size
+        self.raw = raw
+        self.external_attr = external_attr
+
+    def with_content(self, content):
+        """A copy of the entry holding new uncompressed content."""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        raw = compressor.compress(content) + compressor.flush()
+        return _ZipEntry(self.name, self.flags, zipfile.ZIP_DEFLATED, self.dos_time, self.dos_date,
+                         zlib.crc32(content), len(content), raw, self.external_attr)
+
+def _write_zip(entries):
+    """Write entries, already compressed, as a zip file."""
+    output = io.BytesIO()
+    directory = []
+    for entry in entries:
+        offset = output.tell()
+        output.write(_LOCAL_HEADER.pack(
+            0x04034B50, 20, entry.flags, entry.method, entry.dos_time, entry.dos_date,
+            entry.crc, len(entry.raw), entry.size, len(entry.name), 0
+        ))
+        output.write(entry.name)
+        output.write(entry.raw)
+        directory.append(_CENTRAL_HEADER.pack(
+            0x02014B50, 20, 20, entry.flags, entry.method, entry.dos_time, entry.dos_date,
+            entry.crc, len(entry.raw), entry.size, len(entry.name), 0, 0, 0, 0,
+            entry.external_attr, offset
+        ) + entry.name)
+    directory_offset = output.tell()
+    for record in directory:
+        output.write(record)
+    output.write(_END_RECORD.pack(
+        0x06054B50, 0, 0, len(directory), len(directory),
+        output.tell() - directory_offset, directory_offset, 0
+    ))
+    return output.getvalue()
+
+class DocxTemplate:
+    """
+    A DOCX template parsed once for filling.
+
+    Every part that contains placeholders is compiled into literal XML and
+    placeholder segments, so filling a record only joins strings and
+    compresses those parts again. Other parts are copied still compressed,
+    and all formatting, styles, headers, footers and images are kept.
+    """
+
+    def __init__(self, entries, parts, prefixes):
+        """
+        Args:
+            entries (list): _ZipEntry for every file in the package
+            parts (dict): Part name -> CompiledTemplate of its XML
+            prefixes (dict): Part name -> namespace prefix of its WordprocessingML tags
+        """
+        self.entries = entries
+        self.parts = parts
+        self.prefixes = prefixes
+        self.fields = list(dict.fromkeys(
+            field for compiled in parts.values() for field in compiled.fields
+        ))
+
+    def _escaped_values(self, data, prefix):
+        """XML for each field's value, with line breaks and tabs as Word elements."""
+        line_break = f'</{prefix}:t><{prefix}:br/><{prefix}:t xml:space="preserve">'
+        tab = f'</{prefix}:t><{prefix}:tab/><{prefix}:t xml:space="preserve">'
+        values = {}
+        for field in self.fields:
+            value = data.get(field)
+            value = f"[{field}]" if value is None else str(value)
+            values[field] = escape(value).replace("\r\n", "\n").replace("\n", line_break).replace("\t", tab)
+        return values
+
+    def render(self, data):
+        """
+        Fill the template with data.
+
+        Placeholders without a value in data are left as they are.
+
+        Args:
+            data (dict): A dictionary with field names and values
+
+        Returns:
+            bytes: The filled DOCX file
+        """
+        values_by_prefix = {}
+        entries = []
+        for entry in self.entries:
+            compiled = self.parts.get(entry.name)
+            if compiled is not None:
+                prefix = self.prefixes[entry.name]
+                if prefix not in values_by_prefix:
+                    values_by_prefix[prefix] = self._escaped_values(data, prefix)
+                entry = entry.with_content(compiled.render(values_by_prefix[prefix]).encode("utf-8"))
+            entries.append(entry)
+        return _write_zip(entries)
+
+def compile_docx_part(xml, prefix="w"):
+    """
+    Compile the XML of one WordprocessingML part for filling.
+
+    Word often splits a placeholder such as [CLIENT_NAME] across several
+    runs. The text runs of each paragraph are scanned together, and a
+    placeholder split across runs is moved whole into its first run, which
+    keeps that run's formatting. Paragraphs without placeholders are left
+    untouched.
+
+    Args:
+        xml (str): XML of the part
+        prefix (str): Namespace prefix of WordprocessingML tags in the part
+
+    Returns:
+        CompiledTemplate: Literal XML and placeholder segments
+    """
+    p = re.escape(prefix)
+    tokens = re.compile(rf"<{p}:t(\s[^>]*)?>([^<]*)</{p}:t>|<{p}:p[\s>/]|</{p}:p>")
+    literals = []
+    fields = []
+    pending = []
+    position = 0
+
+    def flush(runs):
+        """Rewrite the text runs of one paragraph if it holds placeholders."""
+        nonlocal position
+        # html.unescape also decodes &quot;, &apos; and numeric character
+        # references, which would otherwise be escaped a second time below
+        texts = [html.unescape(match.group(2)) for match in runs]
+        joined = "".join(texts)
+        placeholders = list(PLACEHOLDER_PATTERN.finditer(joined))
+        if not placeholders:
+            return
+
+        # Offset where each run's text starts in the joined paragraph text
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text)
+
+        # pieces[i] holds run i's new content as text or (field,) entries
+        pieces = [[] for _ in runs]
+
+        def add_text(start, end):
+            for index, run_start in enumerate(starts):
+                run_end = run_start + len(texts[index])
+                if run_end > start and run_start < end:
+                    pieces[index].append(joined[max(start, run_start):min(end, run_end)])
+
+        cursor = 0
+        for match in placeholders:
+            add_text(cursor, match.start())
+            owner = max(index for index, run_start in enumerate(starts)
+                        if run_start <= match.start() and len(texts[index]))
+            pieces[owner].append((match.group(1),))
+            cursor = match.end()
+        add_text(cursor, len(joined))
+
+        for match, run_pieces in zip(runs, pieces):
+            attributes = match.group(1) or ""
+            if "xml:space" not in attributes:
+                attributes += ' xml:space="preserve"'
+            pending.append(xml[position:match.start()] + f"<{prefix}:t{attributes}>")
+            for piece in run_pieces:
+                if isinstance(piece, tuple):
+                    literals.append("".join(pending))
+                    fields.append(piece[0])
+                    pending.clear()
+                else:
+                    pending.append(escape(piece))
+            pending.append(f"</{prefix}:t>")
+            position = match.end()
+
+    runs = []
+    for match in tokens.finditer(xml):
+        if match.group(2) is not None:
+            runs.append(match)
+        else:
+            # A paragraph starts or ends, so placeholders cannot continue
+            flush(runs)
+            runs = []
+    flush(runs)
+
+    pending.append(xml[position:])
+    literals.append("".join(pending))
+    return CompiledTemplate(literals, fields)
+
+def parse_docx_template(content):
+    """
+    Parse a DOCX file into a fillable template.
+
+    Args:
+        content (bytes): The DOCX file
+
+    Returns:
+        DocxTemplate: The parsed template
+    """
+    entries = []
+    parts = {}
+    prefixes = {}
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        for info in archive.infolist():
+            if info.flag_bits & 0x1:
+                raise ValueError("Encrypted DOCX templates are not supported")
+            if max(info.file_size, info.compress_size, info.header_offset) >= 0xFFFFFFFF:
+                raise ValueError("DOCX templates larger than 4 GB are not supported")
+            
+            # Keep the compressed bytes so unchanged parts are copied as they are
+            name_length, extra_length = _LOCAL_HEADER_LENGTHS.unpack_from(content, info.header_offset + 26)
+            data_start = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+            year, month, day, hour, minute, second = info.date_time
+            entry = _ZipEntry(
+                info.filename.encode("utf-8"),
+                0x800 if not info.filename.isascii() else 0,
+                info.compress_type,
+                (hour << 11) | (minute << 5) | (second // 2),
+                ((year - 1980) << 9) | (month << 5) | day,
+                info.CRC,
+                info.file_size,
+                content[data_start:data_start + info.compress_size],
+                info.external_attr,
+            )
+            entries.append(entry)
+            
+            if _TEXT_PART.match(info.filename):
+                xml = archive.read(info).decode("utf-8")
+                match = _NS_PREFIX.search(xml)
+                prefix = match.group(1) if match else "w"
+                compiled = compile_docx_part(xml, prefix)
+                if compiled.fields:
+                    parts[entry.name] = compiled
+                    prefixes[entry.name] = prefix
+    return DocxTemplate(entries, parts, prefixes)
+
+def load_docx_template(content):
+    """
+    Get the parsed form of a DOCX template, parsing it only once per content.
+
+    Args:
+        content (bytes): The DOCX file
+
+    Returns:
+        DocxTemplate: The parsed template
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    with _docx_cache_lock:
+        template = _docx_cache.get(content_hash)
+        if template is not None:
+            _docx_cache.move_to_end(content_hash)
+            return template
+
+    template = parse_docx_template(content)
+    with _docx_cache_lock:
+        _docx_cache[content_hash] = template
+        if len(_docx_cache) > DOCX_TEMPLATE_CACHE_SIZE:
+            _docx_cache.popitem(last=False)
+    return template
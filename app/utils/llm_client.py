@@ -0,0 +1,197 @@
+import os
+import time
+import itertools
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from .chunking import estimate_tokens
+from .rate_limiter import RateLimiter, LLM_MAX_RETRIES, is_retryable_error, backoff_delay
+
+load_dotenv()
+
+# Requests sent to the model at the same time
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Seconds to wait for a single response
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+
+# Threads beyond max_concurrency for calls given up on at their timeout that
+# have not returned yet, so they never hold up new requests
+_SPARE_THREADS = 16
+
+_client = None
+_client_lock = threading.Lock()
+
+def _chunk_text(chunk):
+    """
+    Text of a streamed response chunk.
+
+    A chunk without parts, such as the last one of a reply stopped for
+    safety, recitation or the token limit, raises ValueError on .text; its
+    text is taken as empty so the answer streamed so far is kept.
+    """
+    try:
+        return chunk.text
+    except ValueError as e:
+        print(f"Skipping response chunk without text: {str(e)}")
+        return ""
+
+class LLMClient:
+    """
+    Asyncio client for the generative model API with bounded concurrency.
+
+    The blocking SDK calls run on a dedicated thread pool, at most
+    max_concurrency at a time. Each call passes its timeout to the SDK,
+    which cancels the HTTP request, and is abandoned after timeout seconds. Every call first waits for room under the requests-per-minute
+    and tokens-per-minute limits, and throttled or temporarily failing calls
+    are retried with jittered exponential backoff. Synchronous callers use
+    the *_sync methods, which run on a background event loop owned by the
+    client.
+    """
+
+    def __init__(self, max_concurrency=None, timeout=None, rate_limiter=None, max_retries=None):
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        self.timeout = timeout or LLM_REQUEST_TIMEOUT
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency + _SPARE_THREADS, thread_name_prefix="llm"
+        )
+        self._semaphores = {}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _semaphore(self):
+        """Get the concurrency semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def generate(self, model_name, prompt, timeout=None, **kwargs):
+        """
+        Generate a response for one prompt.
+
+        Args:
+            model_name (str): Name of the model to use
+            prompt: Prompt text or contents accepted by generate_content
+            timeout (float, optional): Seconds to wait, defaults to the client timeout
+            **kwargs: Extra arguments for generate_content
+
+        Returns:
+            The model response
+        """
+        model = genai.GenerativeModel(model_name)
+        prompt_tokens = estimate_tokens(prompt) if isinstance(prompt, str) else 0
+        timeout = timeout or self.timeout
+        # The SDK cancels the HTTP call itself, so a timed-out call frees its thread
+        kwargs["request_options"] = {**kwargs.get("request_options", {}), "timeout": timeout}
+        attempt = 0
+        while True:
+            async with self._semaphore():
+                await self.rate_limiter.acquire(prompt_tokens)
+                loop = asyncio.get_running_loop()
+                call = loop.run_in_executor(
+                    self._executor, lambda: model.generate_content(prompt, **kwargs)
+                )
+                try:
+                    return await asyncio.wait_for(call, timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Model request timed out after {timeout} seconds")
+                except Exception as api_error:
+                    if attempt >= self.max_retries or not is_retryable_error(api_error):
+                        raise
+                    delay = backoff_delay(attempt, api_error)
+            # Wait outside the semaphore so other requests can use the slot
+            attempt += 1
+            print(f"Model request throttled, retry {attempt} of {self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def generate_many(self, model_name, prompts, timeout=None, **kwargs):
+        """
+        Generate responses for several prompts concurrently.
+
+        Args:
+            model_name (str): Name of the model to use
+            prompts (list): Prompts to send
+            timeout (float, optional): Seconds to wait for each response
+            **kwargs: Extra arguments for generate_content
+
+        Returns:
+            list: Responses in the same order as prompts
+        """
+        return await asyncio.gather(
+            *(self.generate(model_name, prompt, timeout, **kwargs) for prompt in prompts)
+        )
+
+    def generate_stream(self, model_name, prompt, **kwargs):
+        """
+        Generate a response and yield its text as it arrives.
+
+        Runs on the calling thread. The call counts against the same rate
+        limits, and is retried like generate until the first chunk arrives.
+
+        Args:
+            model_name (str): Name of the model to use
+            prompt: Prompt text or contents accepted by generate_content
+            **kwargs: Extra arguments for generate_content
+
+        Yields:
+            str: Text of each response chunk
+        """
+        model = genai.GenerativeModel(model_name)
+        prompt_tokens = estimate_tokens(prompt) if isinstance(prompt, str) else 0
+        attempt = 0
+        while True:
+            time.sleep(self.rate_limiter.reserve(prompt_tokens))
+            try:
+                chunks = iter(model.generate_content(prompt, stream=True, **kwargs))
+                first_chunk = next(chunks, None)
+                break
+            except Exception as api_error:
+                if attempt >= self.max_retries or not is_retryable_error(api_error):
+                    raise
+                delay = backoff_delay(attempt, api_error)
+            attempt += 1
+            print(f"Model request throttled, retry {attempt} of {self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+        if first_chunk is None:
+            return
+        for chunk in itertools.chain([first_chunk], chunks):
+            text = _chunk_text(chunk)
+            if text:
+                yield text
+
+    def _run(self, coroutine):
+        """Run a coroutine on the client's background event loop and wait for it."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def generate_sync(self, model_name, prompt, timeout=None, **kwargs):
+        """Blocking version of generate."""
+        return self._run(self.generate(model_name, prompt, timeout, **kwargs))
+
+    def generate_many_sync(self, model_name, prompts, timeout=None, **kwargs):
+        """Blocking version of generate_many."""
+        return self._run(self.generate_many(model_name, prompts, timeout, **kwargs))
+
+def get_client():
+    """
+    Get the process-wide LLM client, creating it on first use.
+
+    Returns:
+        LLMClient: The shared client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
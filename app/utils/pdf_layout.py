@@ -0,0 +1,215 @@
+from reportlab import rl_config
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.pagesizes import letter
+
+# Write page streams as plain Flate data. ASCII85 wrapping only makes files
+# larger and, without reportlab's C accelerator, dominates export time.
+rl_config.useA85 = 0
+
+# Page layout used by generate_pdf
+PDF_FONT = "Helvetica"
+PDF_FONT_SIZE = 12
+PDF_LEADING = 15
+PDF_MARGIN = 50
+
+# Shortest part of a paragraph allowed alone at the bottom (orphan) or
+# top (widow) of a page
+MIN_PARAGRAPH_LINES = 2
+
+# Words whose widths are remembered per font and size
+WIDTH_CACHE_SIZE = 100000
+
+_metrics = {}
+
+class FontMetrics:
+    """
+    Text widths for one font and size, memoized per word.
+
+    Widths of the standard PDF fonts add up character by character, so a
+    line is measured as the sum of its cached word widths plus spaces.
+    """
+
+    def __init__(self, font_name, font_size):
+        self.font_name = font_name
+        self.font_size = font_size
+        self.space_width = stringWidth(" ", font_name, font_size)
+        self._widths = {}
+
+    def width(self, text):
+        """Width of a piece of text in points."""
+        width = self._widths.get(text)
+        if width is None:
+            width = stringWidth(text, self.font_name, self.font_size)
+            if len(self._widths) >= WIDTH_CACHE_SIZE:
+                self._widths.clear()
+            self._widths[text] = width
+        return width
+
+def get_font_metrics(font_name=PDF_FONT, font_size=PDF_FONT_SIZE):
+    """
+    Get the shared width cache for a font and size.
+
+    Returns:
+        FontMetrics: Metrics reused by every export in the process
+    """
+    key = (font_name, font_size)
+    metrics = _metrics.get(key)
+    if metrics is None:
+        metrics = _metrics[key] = FontMetrics(font_name, font_size)
+    return metrics
+
+def _break_word(word, metrics, max_width):
+    """Split a word wider than max_width into pieces that fit."""
+    pieces = []
+    piece = ""
+    piece_width = 0
+    for char in word:
+        char_width = metrics.width(char)
+        if piece and piece_width + char_width > max_width:
+            pieces.append(piece)
+            piece, piece_width = "", 0
+        piece += char
+        piece_width += char_width
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+def wrap_line(line, metrics, max_width):
+    """
+    Wrap one line of text to a width, greedily on spaces.
+
+    Leading indentation is kept on every wrapped line, and words wider than
+    the line are broken between characters.
+
+    Args:
+        line (str): Line of text without newlines
+        metrics (FontMetrics): Metrics of the font used
+        max_width (float): Available width in points
+
+    Returns:
+        list: Wrapped lines (one empty string for a blank line)
+    """
+    line = line.expandtabs(4).rstrip()
+    words = line.split(" ")
+    indent = len(line) - len(line.lstrip(" "))
+    prefix = " " * indent
+    prefix_width = indent * metrics.space_width
+    if prefix_width > max_width / 2:
+        prefix, prefix_width = "", 0
+
+    lines = []
+    current = []
+    current_width = prefix_width
+    for word in words[indent:]:
+        if not word:
+            # Keep runs of spaces inside the line
+            current.append(word)
+            current_width += metrics.space_width
+            continue
+        word_width = metrics.width(word)
+        space = metrics.space_width if current else 0
+        if current and current_width + space + word_width > max_width:
+            lines.append(prefix + " ".join(current))
+            current, current_width, space = [], prefix_width, 0
+        if prefix_width + word_width > max_width:
+            pieces = _break_word(word, metrics, max_width - prefix_width)
+            lines.extend(prefix + piece for piece in pieces[:-1])
+            word = pieces[-1]
+            word_width = metrics.width(word)
+        current.append(word)
+        current_width += space + word_width
+    lines.append(prefix + " ".join(current) if current else "")
+    return lines
+
+def paginate(paragraphs, lines_per_page, min_lines=MIN_PARAGRAPH_LINES):
+    """
+    Break wrapped paragraphs into pages with widow and orphan control.
+
+    A paragraph split across pages leaves at least min_lines lines on each
+    side of the break, unless it is too short to split that way, in which
+    case it moves to the next page whole. Blank lines falling at the top of
+    a page are dropped.
+
+    Args:
+        paragraphs (list): Lists of wrapped lines, one list per paragraph
+        lines_per_page (int): Lines that fit on a page
+        min_lines (int): Smallest part of a paragraph allowed on a page
+
+    Returns:
+        list: Pages, each a list of lines
+    """
+    pages = []
+    page = []
+    for lines in paragraphs:
+        if lines == [""] and pages and not page:
+            # Blank lines are not carried to the top of a page
+            continue
+        start = 0
+        while start < len(lines):
+            remaining = len(lines) - start
+            room = lines_per_page - len(page)
+            if remaining <= room:
+                page.extend(lines[start:])
+                break
+            take = room
+            if remaining - take < min_lines:
+                # Avoid a widow: leave enough lines for the next page
+                take = remaining - min_lines
+            if take < min_lines and page:
+                # Avoid an orphan: start the paragraph on a new page
+                take = 0
+            if take <= 0 and not page:
+                # A page of its own cannot hold more; split it anyway
+                take = room
+            page.extend(lines[start:start + take])
+            start += take
+            pages.append(page)
+            page = []
+    if page or not pages:
+        pages.append(page)
+    return pages
+
+def layout_text(text, page_size=letter, font_name=PDF_FONT, font_size=PDF_FONT_SIZE,
+                leading=PDF_LEADING, margin=PDF_MARGIN):
+    """
+    Lay out plain text as pages of wrapped lines.
+
+    Each line of the text is a paragraph. Layout is done in one pass over
+    the words, so it takes time linear in the length of the text.
+
+    Args:
+        text (str): Text to lay out
+        page_size (tuple): Page width and height in points
+        font_name (str): Font used for the text
+        font_size (float): Font size in points
+        leading (float): Distance between baselines in points
+        margin (float): Page margin in points
+
+    Returns:
+        list: Pages, each a list of lines
+    """
+    width, height = page_size
+    metrics = get_font_metrics(font_name, font_size)
+    max_width = width - 2 * margin
+    lines_per_page = max(1, int((height - 2 * margin) // leading) + 1)
+    paragraphs = [wrap_line(line, metrics, max_width) for line in text.split("\n")]
+    return paginate(paragraphs, lines_per_page)
+
+def draw_pages(c, pages, page_size=letter, font_name=PDF_FONT, font_size=PDF_FONT_SIZE,
+               leading=PDF_LEADING, margin=PDF_MARGIN):
+    """
+    Draw laid-out pages on a reportlab canvas, one text object per page.
+
+    Args:
+        c (Canvas): Canvas to draw on
+        pages (list): Pages from layout_text
+    """
+    height = page_size[1]
+    for number, lines in enumerate(pages):
+        if number:
+            c.showPage()
+        text_object = c.beginText(margin, height - margin)
+        text_object.setFont(font_name, font_size, leading)
+        for line in lines:
+            text_object.textLine(line)
+        c.drawText(text_object)
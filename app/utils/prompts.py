@@ -0,0 +1,168 @@
+import os
+import re
+import textwrap
+from collections import Counter
+from dotenv import load_dotenv
+
+from .chunking import estimate_tokens, CHARS_PER_TOKEN, PAGE_BREAK
+from .template_engine import PLACEHOLDER_PATTERN
+
+load_dotenv()
+
+# Maximum estimated tokens per request for each task. Document extraction
+# is bounded by EXTRACTION_CHUNK_TOKENS instead, by switching to chunked mode.
+TEMPLATE_ANALYSIS_PROMPT_TOKENS = int(os.getenv("TEMPLATE_ANALYSIS_PROMPT_TOKENS", "8000"))
+CHAT_PROMPT_TOKENS = int(os.getenv("CHAT_PROMPT_TOKENS", "8000"))
+
+TRUNCATION_MARKER = "\n[... content truncated ...]"
+
+_SPACES = re.compile(r"[ \t]+")
+_DOCUMENT_SPACES = re.compile(r" {2,}")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_DIGITS = re.compile(r"\d+")
+
+# Page number lines such as "3", "- 3 -", "Page 3" or "Page 3 of 12", which
+# differ on every page only in their numbers
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?[-\u2013(]?\s*\d+\s*[-\u2013)]?(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE)
+
+def compact(text):
+    """
+    Remove layout whitespace from prompt instructions.
+
+    Dedents the text, collapses runs of spaces and tabs, and drops blank
+    lines, so indented triple-quoted strings cost no extra tokens.
+
+    Args:
+        text (str): Instruction text
+
+    Returns:
+        str: Compacted text
+    """
+    lines = (_SPACES.sub(" ", line).strip() for line in textwrap.dedent(text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+def strip_repeated_headers_footers(text, edge_lines=2, min_ratio=0.5, min_pages=3):
+    """
+    Remove page headers and footers repeated across the pages of a document.
+
+    Pages are separated by form feeds, as read_pdf returns them. A line
+    among the first or last edge_lines of a page is dropped when the same
+    line starts or ends at least min_ratio of the pages. Lines are compared
+    exactly, except page number lines, whose numbers are ignored. Lines
+    holding [PLACEHOLDER] fields are always kept.
+
+    Args:
+        text (str): Document text
+        edge_lines (int): Lines at the top and bottom of each page to check
+        min_ratio (float): Share of pages a line must repeat on
+        min_pages (int): Documents with fewer pages are left unchanged
+
+    Returns:
+        str: Document text without repeated headers and footers
+    """
+    pages = [page.strip("\n").split("\n") for page in text.split("\f")]
+    if len(pages) < min_pages:
+        return text
+
+    def key(line):
+        line = line.strip()
+        if PLACEHOLDER_PATTERN.search(line):
+            return None
+        return _DIGITS.sub("#", line) if _PAGE_NUMBER.match(line) else line
+
+    def edge_count(lines):
+        # Short pages keep at least one line that is never treated as an edge
+        return min(edge_lines, (len(lines) - 1) // 2)
+
+    counts = Counter()
+    for lines in pages:
+        edge = edge_count(lines)
+        edges = {key(line) for line in lines[:edge] + lines[len(lines) - edge:] if line.strip()}
+        edges.discard(None)
+        counts.update(edges)
+    threshold = max(2, min_ratio * len(pages))
+    repeated = {line for line, count in counts.items() if count >= threshold}
+    if not repeated:
+        return text
+
+    cleaned_pages = []
+    for lines in pages:
+        edge = edge_count(lines)
+        last = len(lines) - edge
+        kept = [
+            line for index, line in enumerate(lines)
+            if not ((index < edge or index >= last) and key(line) in repeated)
+        ]
+        cleaned_pages.append("\n".join(kept))
+    return PAGE_BREAK.join(page for page in cleaned_pages if page.strip())
+
+def clean_document_text(text):
+    """
+    Prepare extracted document text for a prompt.
+
+    Strips repeated page headers and footers, trailing spaces, runs of
+    spaces and runs of blank lines, while keeping line and paragraph breaks.
+
+    Args:
+        text (str): Extracted document text
+
+    Returns:
+        str: Cleaned text
+    """
+    text = strip_repeated_headers_footers(text)
+    text = "\n".join(_DOCUMENT_SPACES.sub(" ", line).rstrip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+def count_tokens(text):
+    """
+    Count the tokens of a prompt before it is sent.
+
+    Uses a local estimate, since asking the API would cost a round trip.
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Estimated token count
+    """
+    return estimate_tokens(text)
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Shorten text to fit a token budget, marking where it was cut.
+
+    Args:
+        text (str): Text to shorten
+        max_tokens (int): Token budget for the text
+
+    Returns:
+        str: The text, truncated if it was over budget
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    return text[:max_chars] + TRUNCATION_MARKER
+
+def build_prompt(instructions, content="", trailer="", max_tokens=None):
+    """
+    Build a compact prompt from instructions, content and closing instructions.
+
+    Instructions are compacted, content is cleaned, and the content is
+    truncated so that the whole prompt fits max_tokens.
+
+    Args:
+        instructions (str): Instructions placed before the content
+        content (str): Document or template text
+        trailer (str): Instructions placed after the content
+        max_tokens (int, optional): Token budget for the whole prompt
+
+    Returns:
+        str: The prompt
+    """
+    head = compact(instructions)
+    tail = compact(trailer)
+    body = clean_document_text(content) if content else ""
+    if max_tokens is not None and body:
+        overhead = count_tokens(head) + count_tokens(tail) + 2
+        body = truncate_to_tokens(body, max(0, max_tokens - overhead))
+    return "\n\n".join(part for part in (head, body, tail) if part)
@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Quota ceilings shared by every model call in the process (0 disables a limit)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+
+# Retry policy for throttled or temporarily failing calls
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "60"))
+
+# Retry hints found in API error messages, e.g. "Please retry in 12.5s",
+# "retry_delay { seconds: 13 }" or "Retry-After: 30"
+_RETRY_HINT_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*([\d.]+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+]
+
+# Per-minute throttling and temporary server failures are worth retrying;
+# daily or hard quota errors won't clear within the retry window
+_THROTTLING_MARKERS = ["rate limit", "per minute", "perminute", "503", "unavailable", "500 internal"]
+_DAILY_QUOTA_MARKERS = ["per day", "perday", "daily"]
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at capacity per period.
+
+    Callers reserve tokens up front and are told how long to wait before
+    using them, so waiters are served in arrival order and the bucket never
+    lets more than its capacity through in a period.
+    """
+
+    def __init__(self, capacity, period=60.0, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Take tokens from the bucket.
+
+        Args:
+            amount (float): Tokens needed, capped at the bucket capacity
+
+        Returns:
+            float: Seconds to wait before the tokens may be used
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits in front of model calls."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        requests_per_minute = LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        tokens_per_minute = LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    def reserve(self, tokens=0):
+        """
+        Reserve quota for one request.
+
+        Args:
+            tokens (int): Estimated prompt tokens of the request
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    async def acquire(self, tokens=0):
+        """Wait until a request with the given token count fits the quota."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def is_retryable_error(error):
+    """
+    Check whether an API error is throttling or a temporary failure.
+    
+    Daily quota errors fail fast so callers can fall back straight away.
+    A bare 429 counts as throttling, but a quota error only does when it
+    is per-minute or the server suggests a retry delay.
+    """
+    error_str = str(error).lower()
+    if any(marker in error_str for marker in _DAILY_QUOTA_MARKERS):
+        return False
+    if retry_after_hint(error) is not None:
+        return True
+    if any(marker in error_str for marker in _THROTTLING_MARKERS):
+        return True
+    return "429" in error_str and "quota" not in error_str
+
+def retry_after_hint(error):
+    """
+    Find the server's suggested retry delay in an API error.
+
+    Returns:
+        float: Seconds to wait, or None if the error has no hint
+    """
+    error_str = str(error)
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(error_str)
+        if match:
+            return float(match.group(1))
+    return None
+
+def backoff_delay(attempt, error=None, base_delay=None, max_delay=None):
+    """
+    Delay before retry number attempt (starting at 0).
+
+    Uses the server's retry hint when there is one, otherwise exponential
+    backoff with full jitter.
+
+    Args:
+        attempt (int): Number of retries already made
+        error (Exception, optional): The error that caused the retry
+        base_delay (float, optional): First backoff step in seconds
+        max_delay (float, optional): Upper bound for any delay
+
+    Returns:
+        float: Seconds to wait
+    """
+    base_delay = LLM_RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = LLM_RETRY_MAX_DELAY if max_delay is None else max_delay
+    hint = retry_after_hint(error) if error is not None else None
+    if hint is not None:
+        return min(max_delay, hint + random.uniform(0, base_delay))
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
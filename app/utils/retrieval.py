@@ -0,0 +1,166 @@
+import os
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+
+from .chunking import split_into_chunks
+from .prompts import clean_document_text
+
+load_dotenv()
+
+# Size of the indexed chunks and number of chunks retrieved per question
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "250"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+
+# Number of document indexes kept in memory, keyed by content hash
+INDEX_CACHE_SIZE = 16
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it its me my of on or our "
+    "please the their there this to was what when where which who why will with you your".split()
+)
+
+# "Label: value" lines, as produced by filled templates and most forms
+_FIELD_LINE = re.compile(r"^\s*([A-Za-z][\w .'/&()#-]{0,60}?)\s*:\s*(\S.*?)\s*$")
+
+# Questions asking for a single value, e.g. "What is the due date?"
+_LOOKUP_QUESTION = re.compile(
+    r"^\s*(?:what|when|who|where|which)(?:'s|\s+is|\s+was|\s+are)\s+(?:the\s+|our\s+|my\s+)?(.+?)[\s?.!]*$",
+    re.IGNORECASE
+)
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+def tokenize(text):
+    """Split text into lowercase search terms, without stopwords."""
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+def _field_key(label):
+    """Normalize a field label or question subject for lookups."""
+    return " ".join(_WORD.findall(label.lower()))
+
+class DocumentIndex:
+    """
+    BM25 inverted index over the chunks of one document.
+
+    Also records "Label: value" lines so that questions about a single
+    field can be answered without calling the model.
+    """
+
+    def __init__(self, text, chunk_tokens=None):
+        chunk_tokens = RETRIEVAL_CHUNK_TOKENS if chunk_tokens is None else chunk_tokens
+        self.chunks = split_into_chunks(text, chunk_tokens) if text.strip() else []
+        self.postings = {}
+        self.lengths = []
+        for chunk_id, chunk in enumerate(self.chunks):
+            terms = Counter(tokenize(chunk))
+            self.lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                self.postings.setdefault(term, []).append((chunk_id, count))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+
+        self.fields = {}
+        for line in text.splitlines():
+            match = _FIELD_LINE.match(line)
+            if match:
+                key = _field_key(match.group(1))
+                if key and key not in self.fields:
+                    self.fields[key] = (match.group(1).strip(), match.group(2))
+
+    def search(self, query, k=None):
+        """
+        Find the chunks most relevant to a query.
+
+        Args:
+            query (str): Question or search text
+            k (int, optional): Maximum number of chunks to return
+
+        Returns:
+            list: (chunk_id, score) pairs, best first
+        """
+        k = RETRIEVAL_TOP_K if k is None else k
+        scores = Counter()
+        total = len(self.chunks)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, count in postings:
+                norm = 1 - BM25_B + BM25_B * self.lengths[chunk_id] / self.average_length
+                scores[chunk_id] += idf * count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+        return scores.most_common(k)
+
+    def excerpts(self, query, k=None):
+        """
+        Text of the chunks most relevant to a query, in document order.
+
+        Args:
+            query (str): Question or search text
+            k (int, optional): Maximum number of chunks to return
+
+        Returns:
+            list: Chunk texts
+        """
+        return [self.chunks[chunk_id] for chunk_id, _ in sorted(self.search(query, k))]
+
+    def lookup(self, question):
+        """
+        Answer a question about a single field from the document's "Label: value" lines.
+
+        Args:
+            question (str): The user's question
+
+        Returns:
+            str: The answer, or None if the question is not a simple lookup
+        """
+        match = _LOOKUP_QUESTION.match(question)
+        if not match:
+            return None
+        subject = _field_key(match.group(1))
+        found = self.fields.get(subject)
+        if found is None:
+            subject_words = sorted(subject.split())
+            for key, value in self.fields.items():
+                if sorted(key.split()) == subject_words:
+                    found = value
+                    break
+        if found is None:
+            return None
+        label, value = found
+        return f"{label}: {value}"
+
+def get_document_index(text):
+    """
+    Get the index of a document, building it only the first time.
+
+    Indexes are cached in memory by the hash of the document text.
+
+    Args:
+        text (str): Document text
+
+    Returns:
+        DocumentIndex: The index
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _index_cache_lock:
+        index = _index_cache.get(content_hash)
+        if index is not None:
+            _index_cache.move_to_end(content_hash)
+            return index
+
+    index = DocumentIndex(clean_document_text(text))
+    with _index_cache_lock:
+        _index_cache[content_hash] = index
+        if len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
@@ -0,0 +1,103 @@
+import json
+
+# Response schema for document extraction
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "names": {"type": "array", "items": {"type": "string"}},
+        "dates": {"type": "array", "items": {"type": "string"}},
+        "addresses": {"type": "array", "items": {"type": "string"}},
+        "contact_information": {"type": "array", "items": {"type": "string"}},
+        "financial_information": {"type": "array", "items": {"type": "string"}},
+        "key_topics": {"type": "array", "items": {"type": "string"}},
+        "important_statements": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
+# Response schema for template analysis
+TEMPLATE_FIELDS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "fields": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["fields"],
+}
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+def json_generation_config(schema):
+    """
+    Generation config asking the model for JSON that follows a schema.
+
+    Args:
+        schema (dict): Response schema in the API's OpenAPI subset
+
+    Returns:
+        dict: Value for the generation_config argument of generate_content
+    """
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+def parse_json_response(response_text):
+    """
+    Parse a JSON object from a model response.
+
+    Structured output is plain JSON and parses directly. Otherwise markdown
+    code fences and text around the outermost braces are ignored.
+
+    Args:
+        response_text (str): Raw model response
+
+    Returns:
+        dict: The parsed object, or None if the response has no JSON object
+    """
+    try:
+        parsed = json.loads(response_text)
+    except ValueError:
+        start = response_text.find("{")
+        end = response_text.rfind("}")
+        if start == -1 or end < start:
+            return None
+        try:
+            parsed = json.loads(response_text[start:end + 1])
+        except ValueError:
+            return None
+    return parsed if isinstance(parsed, dict) else None
+
+def matches_schema(value, schema):
+    """
+    Check a parsed value against a response schema.
+
+    Only the parts of the schema the app uses are checked: types, object
+    properties, required keys and array items.
+
+    Args:
+        value: Parsed JSON value
+        schema (dict): Response schema
+
+    Returns:
+        bool: True if the value follows the schema
+    """
+    expected = _JSON_TYPES.get(schema.get("type"))
+    if expected is not None:
+        if not isinstance(value, expected):
+            return False
+        # bool is a subclass of int but not a JSON number
+        if isinstance(value, bool) and expected is not bool:
+            return False
+    if isinstance(value, dict):
+        if any(key not in value for key in schema.get("required", [])):
+            return False
+        properties = schema.get("properties", {})
+        return all(
+            matches_schema(item, properties[key]) for key, item in value.items() if key in properties
+        )
+    if isinstance(value, list) and "items" in schema:
+        return all(matches_schema(item, schema["items"]) for item in value)
+    return True
@@ -0,0 +1,148 @@
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Placeholders look like [FIELD_NAME] and never span lines or nest
+PLACEHOLDER_PATTERN = re.compile(r"\[([^\[\]\r\n]+)\]")
+
+# Number of compiled templates kept in memory
+COMPILED_CACHE_SIZE = 256
+
+_compiled_cache = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+
+class CompiledTemplate:
+    """
+    A template split once into literal text and placeholder segments.
+
+    literals always has one more item than fields: the text before the first
+    placeholder, the text between each pair of placeholders, and the text
+    after the last one. tokens holds the original text of each placeholder
+    when it is not written as [FIELD_NAME].
+    """
+
+    def __init__(self, literals, fields, tokens=None):
+        self.literals = literals
+        self.fields = fields
+        self.tokens = tokens
+
+    def render(self, data):
+        """
+        Fill the template with data in a single pass.
+
+        Placeholders without a value in data are left as they are, and values
+        are inserted verbatim, so a value containing [OTHER_FIELD] is not
+        substituted again.
+
+        Args:
+            data (dict): A dictionary with field names and values
+
+        Returns:
+            str: Filled template
+        """
+        literals = self.literals
+        tokens = self.tokens
+        parts = [literals[0]]
+        for index, field in enumerate(self.fields):
+            value = data.get(field)
+            if value is None:
+                value = f"[{field}]" if tokens is None else tokens[index]
+            parts.append(str(value))
+            parts.append(literals[index + 1])
+        return "".join(parts)
+
+def tokenize_template(template_text, tokens=None):
+    """
+    Split a template into literal and placeholder segments.
+
+    Args:
+        template_text (str): The text content of the template
+        tokens (dict, optional): Placeholders in another notation, such as
+            {{CLIENT_NAME}}, mapped to their field names; by default
+            placeholders are [FIELD_NAME]
+
+    Returns:
+        CompiledTemplate: The tokenized template
+    """
+    if tokens:
+        # Longest first, so a token is never matched by a shorter one inside it
+        pattern = re.compile("|".join(re.escape(token) for token in sorted(tokens, key=len, reverse=True)))
+    else:
+        pattern = PLACEHOLDER_PATTERN
+    literals = []
+    fields = []
+    found_tokens = []
+    position = 0
+    for match in pattern.finditer(template_text):
+        literals.append(template_text[position:match.start()])
+        if tokens:
+            fields.append(tokens[match.group(0)])
+            found_tokens.append(match.group(0))
+        else:
+            fields.append(match.group(1))
+        position = match.end()
+    literals.append(template_text[position:])
+    return CompiledTemplate(literals, fields, found_tokens if tokens else None)
+
+def compile_template(template_text, tokens=None):
+    """
+    Get the compiled form of a template, tokenizing it only once per content.
+
+    Args:
+        template_text (str): The text content of the template
+        tokens (dict, optional): Placeholders in another notation mapped to
+            their field names, as for tokenize_template
+
+    Returns:
+        CompiledTemplate: The compiled template
+    """
+    digest = hashlib.sha256(template_text.encode("utf-8"))
+    if tokens:
+        digest.update(json.dumps(tokens, sort_keys=True).encode("utf-8"))
+    content_hash = digest.hexdigest()
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.get(content_hash)
+        if compiled is not None:
+            _compiled_cache.move_to_end(content_hash)
+            return compiled
+
+    compiled = tokenize_template(template_text, tokens)
+    with _compiled_cache_lock:
+        _compiled_cache[content_hash] = compiled
+        if len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
+
+def scan_placeholders(template_text):
+    """
+    Find every [FIELD_NAME] placeholder in a template in a single pass.
+
+    Args:
+        template_text (str): The text content of the template
+
+    Returns:
+        dict: Field names in order of first appearance, each mapped to the
+            list of character offsets where the placeholder occurs
+    """
+    positions = {}
+    for match in PLACEHOLDER_PATTERN.finditer(template_text):
+        field = match.group(1)
+        if field in positions:
+            positions[field].append(match.start())
+        else:
+            positions[field] = [match.start()]
+    return positions
+
+def find_template_fields(template_text):
+    """
+    List the distinct placeholder fields of a template.
+
+    Args:
+        template_text (str): The text content of the template
+
+    Returns:
+        list: Field names in order of first appearance
+    """
+    return list(scan_placeholders(template_text))
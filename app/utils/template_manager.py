@@ -1,10 +1,312 @@
 import os
+import io
+import re
 import json
+import hashlib
+import tempfile
+import threading
 from pathlib import Path
+from dotenv import load_dotenv
+
+from .cache import TEMPLATE_ANALYSIS_CACHE, TEMPLATE_INDEX_CACHE, get_cache, make_key
+from .document_processor import read_docx, read_pdf
+from .template_engine import find_template_fields, compile_template
+from .template_store import TemplateStore
+
+load_dotenv()
 
 # Default templates directory
 TEMPLATES_DIR = Path("app/templates")
 
+# Where templates are kept: "files" in TEMPLATES_DIR, or "sqlite" for a
+# versioned store at TEMPLATE_DB_PATH (TEMPLATES_DIR/templates.sqlite3 by default)
+TEMPLATE_STORE = os.getenv("TEMPLATE_STORE", "files").lower()
+TEMPLATE_DB_PATH = os.getenv("TEMPLATE_DB_PATH", "")
+
+# Path prefix of templates kept in the SQLite store
+STORE_PATH_PREFIX = "sqlite://"
+
+# Bump when the text extracted from uploaded templates changes
+TEMPLATE_INDEX_VERSION = "2"
+
+_TRAILING_SPACES = re.compile(r"[ \t]+$", re.MULTILINE)
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+# Template file types; a .docx template is used over a .txt one of the same name
+TEMPLATE_EXTENSIONS = (".docx", ".txt")
+
+_registries = {}
+_stores = {}
+_registries_lock = threading.Lock()
+
+class TemplateInfo:
+    """Manifest entry for one template file."""
+
+    def __init__(self, name, path, size, mtime, content_hash, content, placeholders):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.content_hash = content_hash
+        self.content = content
+        self.placeholders = placeholders
+
+def extract_template_text(filename, content):
+    """
+    Convert an uploaded template file to text.
+    
+    PDF and DOCX files are read with the document readers, and their text is
+    normalized: page breaks, trailing spaces and runs of blank lines are
+    removed. Unlike document text sent to the model, repeated headers and
+    footers are kept, since a letterhead may hold fields such as
+    [COMPANY_NAME]. Text files are kept as they are.
+    
+    Args:
+        filename (str): Name of the file, used for its format
+        content (bytes): The file content
+        
+    Returns:
+        str: Text of the template
+    """
+    lower = filename.lower()
+    if lower.endswith('.pdf'):
+        # The PDF reader works on paths so that large files can be parsed in parallel
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_file:
+            tmp_file.write(content)
+        try:
+            text = read_pdf(tmp_file.name)
+        finally:
+            os.remove(tmp_file.name)
+    elif lower.endswith('.docx'):
+        text = read_docx(io.BytesIO(content))
+    else:
+        return content.decode('utf-8', errors='replace')
+    
+    if text.startswith("Error"):
+        raise ValueError(text)
+    text = text.replace("\r\n", "\n").replace("\f", "")
+    text = _BLANK_LINES.sub("\n\n", _TRAILING_SPACES.sub("", text)).strip()
+    if not text:
+        raise ValueError(f"No text found in template '{filename}'")
+    return text + "\n"
+
+def index_docx_template(content, content_hash=None):
+    """
+    Get the text and placeholders of a .docx template, parsing it only once per content.
+    
+    The results are kept in a disk cache shared by every app process, so a
+    .docx template is converted when it is uploaded and never again.
+    
+    Args:
+        content (bytes): The DOCX file
+        content_hash (str, optional): SHA-256 hex digest of content
+        
+    Returns:
+        dict: "content" holding the text and "placeholders" the field names
+    """
+    content_hash = content_hash or hashlib.sha256(content).hexdigest()
+    cache = get_cache(TEMPLATE_INDEX_CACHE)
+    cache_key = make_key(content_hash, TEMPLATE_INDEX_VERSION)
+    index = cache.get(cache_key)
+    if index is None:
+        text = extract_template_text(".docx", content)
+        index = {"content": text, "placeholders": find_template_fields(text)}
+        cache.set(cache_key, index)
+    return index
+
+def _load_template_info(name, path, stat):
+    """Read a template file and build its manifest entry."""
+    with open(path, 'rb') as file:
+        raw = file.read()
+    content_hash = hashlib.sha256(raw).hexdigest()
+    if path.endswith('.docx'):
+        index = index_docx_template(raw, content_hash)
+        content, placeholders = index["content"], index["placeholders"]
+    else:
+        content = raw.decode('utf-8', errors='replace')
+        placeholders = find_template_fields(content)
+    return TemplateInfo(
+        name, path, stat.st_size, stat.st_mtime_ns, content_hash, content, placeholders
+    )
+
+class TemplateRegistry:
+    """
+    In-memory manifest of the templates in a directory.
+
+    The directory is only rescanned when its modification time changes,
+    which happens when a template is added, removed or renamed, and only
+    new or changed files are read again. Listing templates and reading one
+    are dictionary lookups plus at most a few stat calls.
+    """
+
+    def __init__(self, templates_dir):
+        self.templates_dir = Path(templates_dir)
+        self._templates = {}
+        self._by_path = {}
+        self._dir_mtime = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """
+        Bring the manifest up to date with the directory.
+
+        Args:
+            force (bool): Rescan even if the directory looks unchanged
+        """
+        try:
+            dir_mtime = os.stat(self.templates_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        with self._lock:
+            if not force and dir_mtime == self._dir_mtime:
+                return
+            templates = {}
+            if dir_mtime is not None:
+                # Extensions sort so that .docx comes before .txt and wins
+                for entry in sorted(os.scandir(self.templates_dir), key=lambda entry: entry.name):
+                    name, extension = os.path.splitext(entry.name)
+                    if extension not in TEMPLATE_EXTENSIONS or name in templates or not entry.is_file():
+                        continue
+                    info = self._load(name, os.path.join(str(self.templates_dir), entry.name), entry.stat())
+                    if info is not None:
+                        templates[name] = info
+            self._templates = templates
+            self._by_path = {info.path: info for info in templates.values()}
+            self._dir_mtime = dir_mtime
+
+    def _load(self, name, path, stat):
+        """Reuse the current entry for a file if it is unchanged, otherwise read it."""
+        current = self._by_path.get(path)
+        if current is not None and (current.size, current.mtime) == (stat.st_size, stat.st_mtime_ns):
+            return current
+        try:
+            return _load_template_info(name, path, stat)
+        except Exception as e:
+            print(f"Error reading template {path}: {str(e)}")
+            return None
+
+    def invalidate(self):
+        """Force a rescan on next use, e.g. after a template is rewritten in place."""
+        with self._lock:
+            self._dir_mtime = None
+
+    def names(self):
+        """Template names in alphabetical order."""
+        self.refresh()
+        return sorted(self._templates)
+
+    def paths(self):
+        """Template names mapped to their file paths."""
+        self.refresh()
+        return {name: self._templates[name].path for name in sorted(self._templates)}
+
+    def get(self, name):
+        """
+        Get the manifest entry of a template.
+
+        The file is checked with one stat call, so a template edited in
+        place is read again.
+
+        Returns:
+            TemplateInfo: The entry, or None if there is no such template
+        """
+        self.refresh()
+        info = self._templates.get(name)
+        if info is not None:
+            try:
+                stat = os.stat(info.path)
+            except OSError:
+                self.refresh(force=True)
+                return self._templates.get(name)
+            if (stat.st_size, stat.st_mtime_ns) != (info.size, info.mtime):
+                self.refresh(force=True)
+                return self._templates.get(name)
+        return info
+
+    def get_by_path(self, path):
+        """Get the manifest entry of a template file, or None if it is not registered."""
+        self.refresh()
+        info = self._by_path.get(str(path))
+        return self.get(info.name) if info is not None else None
+
+def get_registry():
+    """
+    Get the registry of the current templates directory, creating it on first use.
+
+    Returns:
+        TemplateRegistry: The shared registry
+    """
+    key = str(TEMPLATES_DIR)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = TemplateRegistry(TEMPLATES_DIR)
+        return registry
+
+def use_template_store():
+    """Check whether templates are kept in the SQLite store instead of files."""
+    return TEMPLATE_STORE == "sqlite"
+
+def get_template_store():
+    """
+    Get the SQLite template store, creating it on first use.
+
+    A new, empty store is filled with the templates in TEMPLATES_DIR.
+
+    Returns:
+        TemplateStore: The shared store
+    """
+    path = TEMPLATE_DB_PATH or str(TEMPLATES_DIR / "templates.sqlite3")
+    with _registries_lock:
+        store = _stores.get(path)
+        if store is not None:
+            return store
+        store = TemplateStore(path)
+        if store.count() == 0:
+            registry = TemplateRegistry(TEMPLATES_DIR)
+            for name in registry.names():
+                info = registry.get(name)
+                is_docx = info.path.endswith('.docx')
+                raw = None
+                if is_docx:
+                    with open(info.path, 'rb') as file:
+                        raw = file.read()
+                store.save(name, info.content, raw, "docx" if is_docx else "txt")
+        _stores[path] = store
+        return store
+
+def _store_path(template_name, template_format):
+    """Template path of a template kept in the SQLite store."""
+    return f"{STORE_PATH_PREFIX}{template_name}.{template_format}"
+
+def _store_template_name(template_path):
+    """Template name from a template path of the SQLite store, or None for a file path."""
+    template_path = str(template_path)
+    if not template_path.startswith(STORE_PATH_PREFIX):
+        return None
+    return template_path[len(STORE_PATH_PREFIX):].rsplit('.', 1)[0]
+
+def get_template_info(template_name):
+    """
+    Get the manifest entry of a template: path, size, mtime, content hash,
+    content and placeholders.
+    
+    Args:
+        template_name (str): Name of the template
+        
+    Returns:
+        TemplateInfo: The entry, or None if there is no such template
+    """
+    if use_template_store():
+        template = get_template_store().get(template_name)
+        if template is None:
+            return None
+        return TemplateInfo(
+            template_name, _store_path(template_name, template["format"]), template["size"],
+            template["updated_at"], template["content_hash"], template["content"], template["placeholders"]
+        )
+    return get_registry().get(template_name)
+
 def get_available_templates():
     """
     Get a list of available templates.
@@ -12,12 +314,33 @@ def get_available_templates():
     Returns:
         list: List of available template names
     """
-    templates = []
     try:
-        for file in os.listdir(TEMPLATES_DIR):
-            if file.endswith('.txt'):
-                templates.append(file.rsplit('.', 1)[0])
-        return templates
+        if use_template_store():
+            return get_template_store().list_names(limit=None)
+        return get_registry().names()
+    except Exception as e:
+        print(f"Error getting templates: {str(e)}")
+        return []
+
+def list_templates_page(offset=0, limit=100, prefix=None):
+    """
+    List template names one page at a time.
+    
+    Args:
+        offset (int): Number of names to skip
+        limit (int): Page size
+        prefix (str, optional): Only names starting with this text
+        
+    Returns:
+        list: Template names in alphabetical order
+    """
+    try:
+        if use_template_store():
+            return get_template_store().list_names(offset, limit, prefix)
+        names = get_registry().names()
+        if prefix:
+            names = [name for name in names if name.startswith(prefix)]
+        return names[offset:offset + limit]
     except Exception as e:
         print(f"Error getting templates: {str(e)}")
         return []
@@ -29,17 +352,63 @@ def list_templates():
     Returns:
         dict: Dictionary of template names and paths
     """
-    templates = {}
     try:
-        for file in os.listdir(TEMPLATES_DIR):
-            if file.endswith('.txt'):
-                template_name = file.rsplit('.', 1)[0]
-                templates[template_name] = str(TEMPLATES_DIR / file)
-        return templates
+        if use_template_store():
+            return {
+                name: _store_path(name, template_format)
+                for name, template_format in get_template_store().names_and_formats().items()
+            }
+        return get_registry().paths()
     except Exception as e:
         print(f"Error listing templates: {str(e)}")
         return {}
 
+def get_template_versions(template_name):
+    """
+    List the saved versions of a template. Only the SQLite store keeps versions.
+    
+    Args:
+        template_name (str): Name of the template
+        
+    Returns:
+        list: (version, content_hash, created_at) tuples, oldest first
+    """
+    if use_template_store():
+        return get_template_store().versions(template_name)
+    info = get_registry().get(template_name)
+    return [(1, info.content_hash, info.mtime / 1e9)] if info is not None else []
+
+def record_template_use(template_name):
+    """
+    Count one use of a template. Only the SQLite store keeps usage counters.
+    
+    Args:
+        template_name (str): Name of the template
+    """
+    if use_template_store():
+        try:
+            get_template_store().record_use(template_name)
+        except Exception as e:
+            print(f"Error recording template use: {str(e)}")
+
+def invalidate_template_cache(template_name):
+    """
+    Drop cached analysis results and manifest entries for a template that has changed.
+    
+    Args:
+        template_name (str): Name of the template
+    """
+    get_cache(TEMPLATE_ANALYSIS_CACHE).invalidate_tag(template_name)
+    get_registry().invalidate()
+
+def _remove_other_formats(template_name, keep_extension):
+    """Delete other files of a template so the newly saved one is used."""
+    for extension in TEMPLATE_EXTENSIONS:
+        if extension != keep_extension:
+            other_path = TEMPLATES_DIR / f"{template_name}{extension}"
+            if other_path.exists():
+                os.remove(other_path)
+
 def save_template(template_name, template_content):
     """
     Save a new template.
@@ -52,9 +421,14 @@ def save_template(template_name, template_content):
         bool: Success status
     """
     try:
-        template_path = TEMPLATES_DIR / f"{template_name}.txt"
-        with open(template_path, 'w') as file:
-            file.write(template_content)
+        if use_template_store():
+            get_template_store().save(template_name, template_content)
+        else:
+            template_path = TEMPLATES_DIR / f"{template_name}.txt"
+            with open(template_path, 'w') as file:
+                file.write(template_content)
+            _remove_other_formats(template_name, ".txt")
+        invalidate_template_cache(template_name)
         return True
     except Exception as e:
         print(f"Error saving template: {str(e)}")
@@ -68,19 +442,78 @@ def read_template(template_path):
         template_path (str): Path to the template file
         
     Returns:
-        str: Content of the template
+        str: Content of the template (the text of a .docx template)
     """
     try:
+        store_name = _store_template_name(template_path)
+        if store_name is not None:
+            template = get_template_store().get(store_name)
+            if template is None:
+                raise FileNotFoundError(f"No template named '{store_name}'")
+            return template["content"]
+        info = get_registry().get_by_path(template_path)
+        if info is not None:
+            return info.content
+        if str(template_path).endswith('.docx'):
+            with open(template_path, 'rb') as file:
+                return index_docx_template(file.read())["content"]
         with open(template_path, 'r') as file:
             return file.read()
     except Exception as e:
         print(f"Error reading template: {str(e)}")
         return f"Error reading template: {str(e)}"
 
+def get_compiled_template(template_path):
+    """
+    Get a template split into literal text and placeholder segments, ready to fill.
+    
+    Templates in the SQLite store use the segments saved with them, so they
+    are not tokenized again. Other templates go through compile_template.
+    
+    Args:
+        template_path (str): Path to the template file
+        
+    Returns:
+        CompiledTemplate: The compiled template
+    """
+    store_name = _store_template_name(template_path)
+    if store_name is not None:
+        compiled = get_template_store().get_compiled(store_name)
+        if compiled is None:
+            raise FileNotFoundError(f"No template named '{store_name}'")
+        return compiled
+    content = read_template(template_path)
+    if content.startswith("Error"):
+        raise ValueError(content)
+    return compile_template(content)
+
+def read_template_file(template_path):
+    """
+    Read the original file of a template, such as a .docx template.
+    
+    Args:
+        template_path (str): Path to the template file
+        
+    Returns:
+        bytes: The file content
+    """
+    store_name = _store_template_name(template_path)
+    if store_name is None:
+        with open(template_path, 'rb') as file:
+            return file.read()
+    template = get_template_store().get(store_name)
+    if template is None:
+        raise FileNotFoundError(f"No template named '{store_name}'")
+    return template["raw"] if template["raw"] is not None else template["content"].encode("utf-8")
+
 def save_uploaded_template(uploaded_file, template_name=None):
     """
     Save an uploaded template file.
     
+    PDF templates are converted to text once here and saved as text
+    templates. DOCX templates are kept as they are, so they can be filled
+    natively, and their text and placeholders are indexed at the same time.
+    
     Args:
         uploaded_file: The uploaded file object from Streamlit
         template_name (str, optional): Name to save the template as
@@ -92,14 +525,34 @@ def save_uploaded_template(uploaded_file, template_name=None):
         if template_name is None:
             template_name = uploaded_file.name.rsplit('.', 1)[0]
         
+        content = uploaded_file.getvalue()
+        # Word templates are kept as .docx so they can be filled natively
+        if uploaded_file.name.lower().endswith(".docx"):
+            extension = ".docx"
+            text = index_docx_template(content)["content"]
+        else:
+            extension = ".txt"
+            text = extract_template_text(uploaded_file.name, content)
+            content = text.encode('utf-8')
+        
+        if use_template_store():
+            if extension == ".docx":
+                get_template_store().save(template_name, text, content, "docx")
+            else:
+                get_template_store().save(template_name, text)
+            invalidate_template_cache(template_name)
+            return _store_path(template_name, extension[1:])
+        
         # Ensure the templates directory exists
         os.makedirs(TEMPLATES_DIR, exist_ok=True)
         
         # Save the file
-        template_path = TEMPLATES_DIR / f"{template_name}.txt"
+        template_path = TEMPLATES_DIR / f"{template_name}{extension}"
         
         with open(template_path, 'wb') as f:
-            f.write(uploaded_file.getvalue())
+            f.write(content)
+        _remove_other_formats(template_name, extension)
+        invalidate_template_cache(template_name)
             
         return str(template_path)
     except Exception as e:
@@ -110,10 +563,19 @@ def get_template_path(template_name):
     """
     Get the path to a template file.
     
+    Templates in the SQLite store have paths of the form
+    sqlite://<name>.<format>, which read_template and read_template_file accept.
+    
     Args:
         template_name (str): Name of the template
         
     Returns:
         str: Path to the template file
     """
-    return str(TEMPLATES_DIR / f"{template_name}.txt") 
\ No newline at end of file
+    if use_template_store():
+        template = get_template_store().get(template_name)
+        return _store_path(template_name, template["format"] if template else "txt")
+    info = get_registry().get(template_name)
+    if info is not None:
+        return info.path
+    return str(TEMPLATES_DIR / f"{template_name}.txt")
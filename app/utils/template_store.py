@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+
+from .template_engine import compile_template, CompiledTemplate
+
+# Page size used when listing templates without an explicit limit
+DEFAULT_PAGE_SIZE = 100
+
+class TemplateStore:
+    """
+    Templates stored in a SQLite database.
+
+    Every save keeps a new version of the template together with its
+    placeholder list and compiled segments, so reads never rescan the text.
+    Usage counters record how often each template is filled. Names are
+    indexed and listing is paginated. The database runs in WAL mode, so
+    several app processes can read while one writes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._initialized = False
+
+    def _connect(self):
+        """Open a connection, creating the tables on first use."""
+        if not self._initialized:
+            os.makedirs(self.path.parent, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS templates ("
+                "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, format TEXT NOT NULL, "
+                "current_version INTEGER NOT NULL, use_count INTEGER NOT NULL DEFAULT 0, "
+                "last_used_at REAL, created_at REAL, updated_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS template_versions ("
+                "template_id INTEGER NOT NULL REFERENCES templates (id), version INTEGER NOT NULL, "
+                "content TEXT NOT NULL, raw BLOB, size INTEGER, content_hash TEXT, "
+                "placeholders TEXT, segments TEXT, created_at REAL, "
+                "PRIMARY KEY (template_id, version))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS templates_use_count ON templates (use_count)")
+            conn.execute("CREATE INDEX IF NOT EXISTS template_versions_hash ON template_versions (content_hash)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def save(self, name, content, raw=None, template_format="txt"):
+        """
+        Save a template as its new current version.
+
+        Saving content identical to the current version does not add a
+        version.
+
+        Args:
+            name (str): Template name
+            content (str): Text content of the template
+            raw (bytes, optional): Original file, kept for .docx templates
+            template_format (str): "txt" or "docx"
+
+        Returns:
+            int: The current version number
+        """
+        source = raw if raw is not None else content.encode("utf-8")
+        content_hash = hashlib.sha256(source).hexdigest()
+        compiled = compile_template(content)
+        placeholders = list(dict.fromkeys(compiled.fields))
+        segments = json.dumps({"literals": compiled.literals, "fields": compiled.fields})
+        now = time.time()
+
+        conn = self._connect()
+        try:
+            # Take the write lock up front so concurrent saves get distinct versions
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT t.id, t.current_version, v.content_hash FROM templates t "
+                "JOIN template_versions v ON v.template_id = t.id AND v.version = t.current_version "
+                "WHERE t.name = ?", (name,)
+            ).fetchone()
+            if row is not None and row["content_hash"] == content_hash:
+                conn.rollback()
+                return row["current_version"]
+            if row is None:
+                template_id = conn.execute(
+                    "INSERT INTO templates (name, format, current_version, created_at, updated_at) "
+                    "VALUES (?, ?, 1, ?, ?)", (name, template_format, now, now)
+                ).lastrowid
+                version = 1
+            else:
+                template_id = row["id"]
+                version = row["current_version"] + 1
+                conn.execute(
+                    "UPDATE templates SET format = ?, current_version = ?, updated_at = ? WHERE id = ?",
+                    (template_format, version, now, template_id)
+                )
+            conn.execute(
+                "INSERT INTO template_versions (template_id, version, content, raw, size, content_hash, "
+                "placeholders, segments, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (template_id, version, content, raw, len(source), content_hash,
+                 json.dumps(placeholders), segments, now)
+            )
+            conn.commit()
+            return version
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get(self, name, version=None):
+        """
+        Get a template.
+
+        Args:
+            name (str): Template name
+            version (int, optional): Version to get, the current one by default
+
+        Returns:
+            dict: name, format, version, content, raw, size, content_hash,
+                placeholders, updated_at and use_count, or None if there is
+                no such template or version
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT t.name, t.format, v.version, v.content, v.raw, v.size, v.content_hash, "
+                "v.placeholders, t.updated_at, t.use_count FROM templates t "
+                "JOIN template_versions v ON v.template_id = t.id "
+                "AND v.version = COALESCE(?, t.current_version) WHERE t.name = ?", (version, name)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        template = dict(row)
+        template["placeholders"] = json.loads(template["placeholders"])
+        return template
+
+    def get_compiled(self, name):
+        """
+        Get the stored compiled segments of a template's current version.
+
+        Returns:
+            CompiledTemplate: The compiled template, or None if there is no such template
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT v.segments FROM templates t JOIN template_versions v "
+                "ON v.template_id = t.id AND v.version = t.current_version WHERE t.name = ?", (name,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        segments = json.loads(row["segments"])
+        return CompiledTemplate(segments["literals"], segments["fields"])
+
+    def list_names(self, offset=0, limit=DEFAULT_PAGE_SIZE, prefix=None, by_usage=False):
+        """
+        List template names one page at a time.
+
+        Args:
+            offset (int): Number of names to skip
+            limit (int): Page size, or None for every name
+            prefix (str, optional): Only names starting with this text
+            by_usage (bool): Most used first instead of alphabetical order
+
+        Returns:
+            list: Template names
+        """
+        sql = "SELECT name FROM templates"
+        params = []
+        if prefix:
+            # A range on the unique name index instead of LIKE, which would scan
+            sql += " WHERE name >= ? AND name < ?"
+            params += [prefix, prefix + "\U0010ffff"]
+        sql += " ORDER BY use_count DESC, name" if by_usage else " ORDER BY name"
+        sql += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        conn = self._connect()
+        try:
+            return [row["name"] for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def names_and_formats(self):
+        """
+        Map every template name to its format.
+
+        Returns:
+            dict: Template names mapped to "txt" or "docx"
+        """
+        conn = self._connect()
+        try:
+            return {row["name"]: row["format"] for row in conn.execute(
+                "SELECT name, format FROM templates ORDER BY name"
+            )}
+        finally:
+            conn.close()
+
+    def count(self):
+        """Number of templates in the store."""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+        finally:
+            conn.close()
+
+    def versions(self, name):
+        """
+        List the versions of a template.
+
+        Returns:
+            list: (version, content_hash, created_at) tuples, oldest first
+        """
+        conn = self._connect()
+        try:
+            return [tuple(row) for row in conn.execute(
+                "SELECT v.version, v.content_hash, v.created_at FROM templates t "
+                "JOIN template_versions v ON v.template_id = t.id WHERE t.name = ? ORDER BY v.version",
+                (name,)
+            )]
+        finally:
+            conn.close()
+
+    def record_use(self, name):
+        """Count one use of a template."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE templates SET use_count = use_count + 1, last_used_at = ? WHERE name = ?",
+                (time.time(), name)
+            )
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Generate documents in bulk from a template and a file of field records.
+
+Example:
+    python batch_generate.py invoice records.csv --output-dir out --format pdf --workers 8
+"""
+
+import sys
+import argparse
+
+from app.utils.batch import run_batch
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Fill a template once per record and export the results.")
+    parser.add_argument("template", help="Template name, as shown in the app")
+    parser.add_argument("records", help="CSV file with a header row, or JSONL file with one object per line")
+    parser.add_argument("--output-dir", default="app/exports/batch", help="Directory for the generated documents")
+    parser.add_argument("--format", choices=["pdf", "docx"], default="pdf", help="Export format")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--name-field", default=None, help="Record field to include in output file names")
+    parser.add_argument("--progress-every", type=int, default=100, help="Report progress every N records")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run a batch and return the process exit code."""
+    args = parse_args(argv)
+    try:
+        result = run_batch(
+            args.template,
+            args.records,
+            args.output_dir,
+            export_format=args.format,
+            workers=args.workers,
+            name_field=args.name_field,
+            progress_every=args.progress_every,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 1 if result["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Benchmark the streaming DOCX reader against the python-docx object model.
+
+Usage: python tests/benchmark_docx_reader.py [PARAGRAPHS]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+import docx
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.document_processor import read_docx
+
+def read_docx_object_model(file_path):
+    """The previous reader: load the whole document and walk its paragraphs."""
+    text = ""
+    doc = docx.Document(file_path)
+    for para in doc.paragraphs:
+        text += para.text + "\n"
+    return text
+
+def make_large_docx(path, paragraphs):
+    """Write a DOCX with many paragraphs and a line item table every 100 paragraphs."""
+    doc = docx.Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Clause {i}: The supplier shall deliver the goods described below.")
+        if i % 100 == 99:
+            table = doc.add_table(rows=5, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = "Item"
+    doc.save(path)
+
+def measure(reader, path):
+    """Return (seconds, peak traced bytes, characters) for one read."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = reader(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(text)
+
+def run_benchmark(paragraphs=20000):
+    """Compare both readers on a generated document."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "large.docx")
+        make_large_docx(path, paragraphs)
+        print(f"Document: {paragraphs} paragraphs, {os.path.getsize(path)} bytes")
+        
+        for name, reader in [("python-docx", read_docx_object_model), ("streaming", read_docx)]:
+            elapsed, peak, chars = measure(reader, path)
+            print(f"{name:>12}: {elapsed:.3f}s, peak memory {peak / 1024 / 1024:.1f} MiB, {chars} characters")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -23,6 +23,8 @@ from app.utils.gemini_api import (
     initialize_gemini, extract_document_content, analyze_template
 )
 
+from app.utils.template_engine import find_template_fields
+
 # Import document processing functions
 from app.utils.document_processor import read_pdf, read_docx
 
@@ -158,12 +160,8 @@ def test_template_field_extraction():
     template_path = TEST_TEMPLATES_DIR / "test_contract.txt"
     template_content = read_template(str(template_path))
     
-    # Simple extraction without Gemini API
-    fields = [
-        field.strip("[]") for field in 
-        template_content.split("[") if "]" in field
-    ]
-    fields = list(set(fields))
+    # Local extraction without Gemini API
+    fields = find_template_fields(template_content)
     
     expected_fields = [
         "COMPANY_NAME", "CLIENT_NAME", "EFFECTIVE_DATE", "SERVICE_DESCRIPTION",
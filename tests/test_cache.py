@@ -0,0 +1,158 @@
+"""
+Tests for the persistent caches in app.utils.cache and their use in the API module.
+"""
+import os
+import sys
+import json
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.api as api
+import app.utils.cache as cache_module
+import app.utils.template_manager as template_manager
+import app.utils.document_processor as document_processor
+from app.utils.cache import DiskCache, make_key
+
+def test_disk_cache_round_trip(tmp_path):
+    """Test storing JSON values and bytes."""
+    cache = DiskCache("test", cache_dir=tmp_path)
+    cache.set("fields", ["NAME", "DATE"])
+    cache.set("blob", b"\x00\x01")
+    
+    assert cache.get("fields") == ["NAME", "DATE"]
+    assert cache.get("blob") == b"\x00\x01"
+    assert cache.get("missing") is None
+    
+    # A second instance sees the same entries, like another process would
+    assert DiskCache("test", cache_dir=tmp_path).get("fields") == ["NAME", "DATE"]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+    
+    print("✅ Disk cache round trip test passed")
+
+def test_disk_cache_lru_eviction(tmp_path):
+    """Test that least recently used entries are evicted first."""
+    cache = DiskCache("test_lru", max_entries=2, cache_dir=tmp_path)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    
+    sized = DiskCache("test_size", max_entries=None, max_bytes=10, cache_dir=tmp_path)
+    sized.set("x", b"12345")
+    sized.set("y", b"12345")
+    sized.set("z", b"12345")
+    assert sized.get("x") is None
+    assert sized.stats()["bytes"] <= 10
+    
+    print("✅ Disk cache LRU eviction test passed")
+
+def test_disk_cache_invalidate_tag(tmp_path):
+    """Test invalidating every entry with a tag."""
+    cache = DiskCache("test_tags", cache_dir=tmp_path)
+    cache.set("k1", 1, tag="invoice")
+    cache.set("k2", 2, tag="letter")
+    cache.invalidate_tag("invoice")
+    
+    assert cache.get("k1") is None
+    assert cache.get("k2") == 2
+    
+    assert make_key("ab", "c") != make_key("a", "bc")
+    
+    print("✅ Disk cache tag invalidation test passed")
+
+def test_analyze_template_uses_cache(tmp_path):
+    """Test that a template is only sent to the model once."""
+    test_cache = DiskCache(cache_module.TEMPLATE_ANALYSIS_CACHE, cache_dir=tmp_path)
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = '{"fields": ["{{COMPANY_NAME}}", "{{CLIENT_NAME}}"]}'
+    
+    with patch.dict(cache_module._caches, {cache_module.TEMPLATE_ANALYSIS_CACHE: test_cache}), \
+         patch.object(api, "get_preferred_model", return_value="models/gemini-1.5-pro"), \
+         patch.object(api.genai, "GenerativeModel", return_value=mock_model):
+        # No [FIELD_NAME] placeholders, so the model is consulted
+        template = "Dear {{CLIENT_NAME}}, from {{COMPANY_NAME}}"
+        
+        assert api.analyze_template(template, "letter") == ["COMPANY_NAME", "CLIENT_NAME"]
+        assert api.analyze_template(template, "letter") == ["COMPANY_NAME", "CLIENT_NAME"]
+        assert mock_model.generate_content.call_count == 1
+        
+        # Saving the template again invalidates its cached analysis
+        template_manager.invalidate_template_cache("letter")
+        api.analyze_template(template, "letter")
+        assert mock_model.generate_content.call_count == 2
+    
+    print("✅ Template analysis cache test passed")
+
+def test_extract_document_content_uses_cache(tmp_path):
+    """Test that re-uploading the same document does not call the model again."""
+    test_cache = DiskCache(cache_module.EXTRACTION_CACHE, cache_dir=tmp_path)
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = '{"names": ["Acme Software Inc."]}'
+    
+    with patch.dict(cache_module._caches, {cache_module.EXTRACTION_CACHE: test_cache}), \
+         patch.object(api, "get_preferred_model", return_value="models/gemini-1.5-pro"), \
+         patch.object(api.genai, "GenerativeModel", return_value=mock_model):
+        first = api.extract_document_content("Agreement with  Acme\n", b"%PDF-1")
+        second = api.extract_document_content("Agreement with Acme", b"%PDF-1")
+        assert first == second
+        assert mock_model.generate_content.call_count == 1
+        
+        # Different file bytes are a different document
+        api.extract_document_content("Agreement with Acme", b"%PDF-2")
+        assert mock_model.generate_content.call_count == 2
+        assert test_cache.stats()["hits"] == 1
+    
+    print("✅ Document extraction cache test passed")
+
+def test_invalid_extraction_is_not_cached(tmp_path):
+    """Test that a reply that is not valid JSON is reported and asked for again."""
+    test_cache = DiskCache(cache_module.EXTRACTION_CACHE, cache_dir=tmp_path)
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = "Sorry, I cannot help with that."
+    
+    with patch.dict(cache_module._caches, {cache_module.EXTRACTION_CACHE: test_cache}), \
+         patch.object(api, "get_preferred_model", return_value="models/gemini-1.5-pro"), \
+         patch.object(api.genai, "GenerativeModel", return_value=mock_model):
+        assert api.extract_document_content("Agreement with Acme").startswith("Error")
+        assert api.extract_document_content("Agreement with Acme", chunked=True).startswith("Error")
+        assert test_cache.stats()["entries"] == 0
+        
+        mock_model.generate_content.return_value.text = '{"names": ["Acme"]}'
+        assert json.loads(api.extract_document_content("Agreement with Acme")) == {"names": ["Acme"]}
+
+def test_disk_cache_ttl(tmp_path):
+    """Test that expired entries are treated as missing."""
+    cache = DiskCache("test_ttl", ttl=60, cache_dir=tmp_path)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    
+    with patch.object(cache_module.time, "time", return_value=cache_module.time.time() + 120):
+        assert cache.get("k") is None
+    
+    print("✅ Disk cache TTL test passed")
+
+def test_export_document_uses_cache(tmp_path):
+    """Test that identical exports are rendered once."""
+    test_cache = DiskCache(cache_module.EXPORT_CACHE, cache_dir=tmp_path)
+    
+    with patch.dict(cache_module._caches, {cache_module.EXPORT_CACHE: test_cache}), \
+         patch.object(document_processor, "render_pdf", wraps=document_processor.render_pdf) as render_pdf:
+        first = document_processor.export_document("Invoice for Acme", "PDF")
+        second = document_processor.export_document("Invoice for Acme", "pdf")
+        assert first == second and first.startswith(b"%PDF")
+        assert render_pdf.call_count == 1
+        
+        # Different content or format is a different export
+        document_processor.export_document("Invoice for Acme Corp", "pdf")
+        assert render_pdf.call_count == 2
+        assert document_processor.export_document("Invoice for Acme", "docx").startswith(b"PK")
+        assert test_cache.stats()["hits"] == 1
+    
+    print("✅ Export cache test passed")
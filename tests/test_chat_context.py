@@ -0,0 +1,99 @@
+"""
+Tests for the bounded AI Assistant context.
+"""
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.api as api
+from app.utils.chat_context import ChatContext, local_summary
+from app.utils.prompts import count_tokens
+
+def test_prompt_layout():
+    """Test that the document prefix comes first and the question last."""
+    context = ChatContext("Instructions")
+    context.set_document("Invoice for Acme Corp")
+    context.add_turn("Who is the client?", "Acme Corp.")
+    prompt = context.build_prompt("What is the total?")
+    
+    assert prompt.startswith("Instructions\n\nInvoice for Acme Corp")
+    assert "User: Who is the client?\nAssistant: Acme Corp." in prompt
+    assert prompt.endswith("User query: What is the total?")
+    
+    # The prefix is identical across turns so it can be reused
+    context.add_turn("What is the total?", "$100")
+    assert context.build_prompt("Thanks").startswith("Instructions\n\nInvoice for Acme Corp")
+
+def test_older_turns_are_summarized():
+    """Test that only the last turns are kept verbatim and older ones are summarized in batches."""
+    summarizer = MagicMock(return_value="The user asked about turns 0 and 1.")
+    context = ChatContext("Instructions", summarizer=summarizer, max_turns=2)
+    for i in range(3):
+        context.add_turn(f"Question {i}", f"Answer {i}")
+    
+    # One turn past max_turns is summarized locally until a full batch is ready
+    summarizer.assert_not_called()
+    prompt = context.build_prompt("Question 3")
+    assert "- User: Question 0 Assistant: Answer 0" in prompt
+    assert "User: Question 1\nAssistant: Answer 1" in prompt
+    
+    context.add_turn("Question 3", "Answer 3")
+    assert context.turns == [("Question 2", "Answer 2"), ("Question 3", "Answer 3")]
+    summarizer.assert_called_once_with(
+        "", [("Question 0", "Answer 0"), ("Question 1", "Answer 1")], context.summary_tokens
+    )
+    
+    prompt = context.build_prompt("Question 4")
+    assert "The user asked about turns 0 and 1." in prompt
+    assert "Question 0" not in prompt
+
+def test_summarizer_failure_uses_local_summary():
+    """Test that a failing summarizer does not lose the older turns."""
+    context = ChatContext("Instructions", summarizer=MagicMock(side_effect=Exception("429 quota")), max_turns=1)
+    context.add_turn("What is the due date?", "March 1")
+    context.add_turn("Thanks", "You're welcome")
+    
+    assert "What is the due date?" in context.summary
+    assert "March 1" in context.summary
+
+def test_local_summary_budget():
+    """Test that the local summary drops the oldest turns to fit its budget."""
+    turns = [(f"Question {i} " + "x" * 100, f"Answer {i}") for i in range(50)]
+    summary = local_summary("", turns, max_tokens=200)
+    
+    assert count_tokens(summary) <= 200
+    assert "Question 49" in summary
+    assert "Question 0 " not in summary
+
+def test_token_ceiling():
+    """Test that prompts stay under the ceiling however large the inputs are."""
+    context = ChatContext("Instructions", max_turns=10, max_tokens=2000)
+    context.set_document("Line of the document\n" * 10000)
+    for i in range(10):
+        context.add_turn(f"Question {i} " + "y" * 1000, f"Answer {i} " + "z" * 1000)
+    prompt = context.build_prompt("Final question " + "q" * 50000)
+    
+    assert count_tokens(prompt) <= 2000
+    assert "Line of the document" in prompt
+    # The most recent turn is the one kept
+    assert "Question 9" in prompt
+    assert "Question 0" not in prompt
+
+def test_summarize_chat():
+    """Test that the model summary is requested with the previous summary and new turns."""
+    mock_response = MagicMock()
+    mock_response.text = "  Updated summary  "
+    mock_client = MagicMock()
+    mock_client.generate_sync.return_value = mock_response
+    
+    with patch.object(api, "get_preferred_model", return_value="models/gemini-1.5-flash"), \
+         patch.object(api, "get_client", return_value=mock_client):
+        summary = api.summarize_chat("Old summary", [("Question", "Answer")], 400)
+    
+    assert summary == "Updated summary"
+    prompt = mock_client.generate_sync.call_args[0][1]
+    assert "Old summary" in prompt
+    assert "User: Question\nAssistant: Answer" in prompt
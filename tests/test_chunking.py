@@ -0,0 +1,70 @@
+"""
+Tests for chunked document extraction.
+"""
+import os
+import sys
+import json
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.api as api
+import app.utils.cache as cache_module
+from app.utils.cache import DiskCache
+from app.utils.chunking import estimate_tokens, split_into_chunks, merge_extraction_results
+
+def test_split_into_chunks():
+    """Test that chunks fit the budget and keep paragraphs whole and in order."""
+    paragraphs = [f"Paragraph {i} " + "word " * 30 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = split_into_chunks(text, max_tokens=100)
+    
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    assert "\n\n".join(chunks).split("\n\n") == paragraphs
+    
+    # A single huge paragraph is still split
+    assert len(split_into_chunks("word " * 1000, max_tokens=50)) > 1
+    assert split_into_chunks("short", max_tokens=50) == ["short"]
+    
+    print("✅ Chunk splitting test passed")
+
+def test_merge_extraction_results():
+    """Test de-duplication of names, dates and amounts across chunks."""
+    merged = merge_extraction_results([
+        {"names": ["Acme Software Inc.", "John Doe"], "dates": ["June 1, 2023"],
+         "financial_information": {"total_cost": "$75,000"}},
+        {"names": ["acme software  inc.", "Jane Smith"], "dates": ["June 1, 2023", "July 1, 2023"],
+         "financial_information": {"total_cost": "$75,000", "deposit": "$22,500"}},
+    ])
+    
+    assert merged["names"] == ["Acme Software Inc.", "John Doe", "Jane Smith"]
+    assert merged["dates"] == ["June 1, 2023", "July 1, 2023"]
+    assert merged["financial_information"] == {"total_cost": "$75,000", "deposit": "$22,500"}
+    
+    print("✅ Extraction merge test passed")
+
+def test_extract_document_content_chunked(tmp_path):
+    """Test that long documents are extracted chunk by chunk and merged."""
+    test_cache = DiskCache(cache_module.EXTRACTION_CACHE, cache_dir=tmp_path)
+    mock_model = MagicMock()
+    
+    def generate_content(prompt, **kwargs):
+        response = MagicMock()
+        name = "Acme" if "Acme" in prompt else "Globex"
+        response.text = json.dumps({"names": [name, "John Doe"]})
+        return response
+    mock_model.generate_content.side_effect = generate_content
+    
+    document = "Acme " * 400 + "\n\n" + "Globex " * 300
+    with patch.dict(cache_module._caches, {cache_module.EXTRACTION_CACHE: test_cache}), \
+         patch.object(api, "EXTRACTION_CHUNK_TOKENS", 600), \
+         patch.object(api, "get_preferred_model", return_value="models/gemini-1.5-pro"), \
+         patch.object(api.genai, "GenerativeModel", return_value=mock_model):
+        result = json.loads(api.extract_document_content(document))
+    
+    assert mock_model.generate_content.call_count == 2
+    assert result == {"names": ["Acme", "John Doe", "Globex"]}
+    
+    print("✅ Chunked extraction test passed")
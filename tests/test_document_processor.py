@@ -0,0 +1,135 @@
+"""
+Tests for document reading in app.utils.document_processor.
+"""
+import os
+import sys
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import docx
+from reportlab.pdfgen import canvas
+
+import app.utils.document_processor as document_processor
+from app.utils.document_processor import (
+    iter_pdf_pages, iter_pdf_pages_parallel, read_pdf, count_pdf_pages,
+    iter_docx_text, read_docx, render_pdf, render_docx, save_export_async
+)
+
+def make_multipage_pdf(path, pages=3):
+    """Write a PDF with one marker line on every page."""
+    c = canvas.Canvas(str(path))
+    for page in range(1, pages + 1):
+        c.drawString(50, 750, f"PAGE {page} MARKER")
+        c.drawString(50, 730, "Body text for this page.")
+        c.showPage()
+    c.save()
+    return path
+
+def test_iter_pdf_pages(tmp_path):
+    """Test page-wise extraction with page ranges."""
+    pdf_path = make_multipage_pdf(tmp_path / "pages.pdf")
+    
+    pages = list(iter_pdf_pages(str(pdf_path)))
+    assert [number for number, _ in pages] == [1, 2, 3]
+    assert "PAGE 1 MARKER" in pages[0][1]
+    assert "PAGE 3 MARKER" in pages[2][1]
+    
+    middle = list(iter_pdf_pages(str(pdf_path), start_page=2, end_page=2))
+    assert len(middle) == 1 and "PAGE 2 MARKER" in middle[0][1]
+    
+    print("✅ PDF page iteration test passed")
+
+def test_read_pdf_character_budget(tmp_path):
+    """Test that read_pdf stops at the character budget."""
+    pdf_path = make_multipage_pdf(tmp_path / "budget.pdf")
+    
+    text = read_pdf(str(pdf_path), max_chars=20)
+    assert len(text) == 20
+    assert text.startswith("PAGE 1 MARKER")
+    assert "PAGE 2 MARKER" in read_pdf(str(pdf_path))
+    
+    # A small file is opened and parsed once, not once to count and once to read
+    with patch.object(document_processor.PyPDF2, "PdfReader", wraps=document_processor.PyPDF2.PdfReader) as reader:
+        read_pdf(str(pdf_path))
+    assert reader.call_count == 1
+    assert read_pdf(str(tmp_path / "missing.pdf")).startswith("Error")
+    
+    print("✅ PDF character budget test passed")
+
+def test_parallel_pdf_extraction_matches_serial(tmp_path):
+    """Test that parallel extraction reassembles pages in order."""
+    pdf_path = make_multipage_pdf(tmp_path / "parallel.pdf", pages=7)
+    
+    serial = list(iter_pdf_pages(str(pdf_path)))
+    parallel = list(iter_pdf_pages_parallel(str(pdf_path), pages_per_task=2))
+    assert parallel == serial
+    
+    assert read_pdf(str(pdf_path), parallel=True) == read_pdf(str(pdf_path), parallel=False)
+    assert count_pdf_pages(str(pdf_path)) == 7
+    
+    # By default each worker gets one contiguous range, since every task parses the file again
+    pool = ThreadPoolExecutor(max_workers=3)
+    with patch.object(document_processor, "PDF_MAX_WORKERS", 3), \
+         patch.object(document_processor, "_get_pdf_pool", return_value=pool), \
+         patch.object(pool, "submit", wraps=pool.submit) as submit:
+        assert list(iter_pdf_pages_parallel(str(pdf_path))) == serial
+    assert [call.args[2:] for call in submit.call_args_list] == [(1, 3), (4, 6), (7, 7)]
+    pool.shutdown()
+    
+    print("✅ Parallel PDF extraction test passed")
+
+def test_read_docx_tables_headers_footers(tmp_path):
+    """Test that the DOCX reader covers tables, headers and footers in order."""
+    doc = docx.Document()
+    doc.sections[0].header.paragraphs[0].text = "Company Header"
+    doc.sections[0].footer.paragraphs[0].text = "Page Footer"
+    doc.add_paragraph("Invoice #: 1001")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Widget"
+    table.cell(0, 1).text = "$10"
+    table.cell(1, 0).text = "Gadget"
+    table.cell(1, 1).text = "$20"
+    doc.add_paragraph("Thank you")
+    docx_path = tmp_path / "invoice.docx"
+    doc.save(str(docx_path))
+    
+    blocks = list(iter_docx_text(str(docx_path)))
+    assert blocks == [
+        "Company Header", "Invoice #: 1001", "Widget\t$10", "Gadget\t$20", "Thank you", "Page Footer"
+    ]
+    assert read_docx(str(docx_path), include_headers_footers=False) == (
+        "Invoice #: 1001\nWidget\t$10\nGadget\t$20\nThank you\n"
+    )
+    assert read_docx(str(tmp_path / "missing.docx")).startswith("Error")
+    
+    print("✅ Streaming DOCX reader test passed")
+
+def test_read_docx_ignores_tab_stops(tmp_path):
+    """Test that tab stop definitions are not read as tab characters."""
+    doc = docx.Document()
+    paragraph = doc.add_paragraph("Name\tValue")
+    paragraph.paragraph_format.tab_stops.add_tab_stop(docx.shared.Inches(1))
+    paragraph.paragraph_format.tab_stops.add_tab_stop(docx.shared.Inches(3))
+    docx_path = tmp_path / "tabs.docx"
+    doc.save(str(docx_path))
+    
+    assert read_docx(str(docx_path)) == "Name\tValue\n"
+    assert read_docx(str(docx_path)).strip() == docx.Document(str(docx_path)).paragraphs[0].text
+
+def test_render_in_memory_and_save_async(tmp_path):
+    """Test that exports render to bytes and are saved in the background."""
+    pdf_data = render_pdf("Hello PDF\nSecond line")
+    docx_data = render_docx("Hello DOCX\nSecond line")
+    assert pdf_data.startswith(b"%PDF")
+    assert docx_data.startswith(b"PK")
+    
+    output_path = tmp_path / "export.pdf"
+    assert save_export_async(pdf_data, str(output_path)).result(timeout=10)
+    assert output_path.read_bytes() == pdf_data
+    assert "Hello PDF" in read_pdf(str(output_path))
+    assert os.listdir(tmp_path) == ["export.pdf"]
+    
+    print("✅ In-memory export test passed")
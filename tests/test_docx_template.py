@@ -0,0 +1,100 @@
+"""
+Tests for filling .docx templates natively.
+"""
+import os
+import io
+import sys
+import json
+from unittest.mock import patch
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import docx
+
+import app.utils.cache as cache_module
+import app.utils.template_manager as template_manager
+from app.utils.batch import run_batch
+from app.utils.cache import DiskCache
+from app.utils.document_processor import read_docx, export_document
+from app.utils.docx_template import load_docx_template, compile_docx_part
+
+def make_docx_template():
+    """A Word template with a placeholder split across differently formatted runs."""
+    document = docx.Document()
+    paragraph = document.add_paragraph("Dear ")
+    run = paragraph.add_run("[CLIENT")
+    run.bold = True
+    paragraph.add_run("_NAME],")
+    document.add_paragraph("You owe [AMOUNT] for [SERVICE].")
+    document.add_paragraph("Thank you.")
+    document.sections[0].header.paragraphs[0].text = "[COMPANY] Ltd."
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+def test_compile_docx_part_merges_split_placeholders():
+    """Test that a placeholder split across runs becomes one field in its first run."""
+    xml = ('<w:p><w:r><w:t>Dear [CLI</w:t></w:r><w:r><w:t>ENT</w:t></w:r>'
+           '<w:r><w:t>] &amp; co</w:t></w:r></w:p><w:p><w:r><w:t>[</w:t></w:r></w:p>')
+    compiled = compile_docx_part(xml)
+    
+    assert compiled.fields == ["CLIENT"]
+    filled = compiled.render({"CLIENT": "Acme"})
+    assert '<w:t xml:space="preserve">Dear Acme</w:t>' in filled
+    assert "<w:t xml:space=\"preserve\"> &amp; co</w:t>" in filled
+    # Paragraphs without placeholders are untouched
+    assert filled.endswith("<w:p><w:r><w:t>[</w:t></w:r></w:p>")
+
+def test_fill_docx_template_keeps_formatting():
+    """Test that values are substituted in the body and header with run formatting kept."""
+    template = load_docx_template(make_docx_template())
+    assert template.fields == ["CLIENT_NAME", "AMOUNT", "SERVICE", "COMPANY"]
+    
+    filled = template.render({"CLIENT_NAME": "Smith & Sons", "AMOUNT": "$5\nplus tax", "COMPANY": "Acme"})
+    text = read_docx(io.BytesIO(filled))
+    assert "Acme Ltd." in text
+    assert "Dear Smith & Sons," in text
+    assert "You owe $5\nplus tax for [SERVICE]." in text
+    
+    document = docx.Document(io.BytesIO(filled))
+    bold_runs = [run.text for run in document.paragraphs[0].runs if run.bold]
+    assert bold_runs == ["Smith & Sons"]
+    
+    # Parsed templates are cached by content
+    content = make_docx_template()
+    assert load_docx_template(content) is load_docx_template(bytes(content))
+
+def test_compile_docx_part_keeps_entities():
+    """Test that quotes and character references in a placeholder's paragraph are not escaped twice."""
+    xml = '<w:p><w:r><w:t>&quot;[NAME]&quot; &#x2014; caf&#233; &apos;x&apos; &amp; &lt;y&gt;</w:t></w:r></w:p>'
+    filled = compile_docx_part(xml).render({"NAME": "Bob"})
+    
+    assert "&amp;quot;" not in filled and "&amp;#" not in filled
+    assert '>"Bob" \u2014 caf\u00e9 \'x\' &amp; &lt;y&gt;</w:t>' in filled
+
+def test_docx_templates_in_manager_export_and_batch(tmp_path):
+    """Test that .docx templates are listed, read, exported and batch-filled natively."""
+    (tmp_path / "letter.docx").write_bytes(make_docx_template())
+    test_cache = DiskCache(cache_module.EXPORT_CACHE, cache_dir=tmp_path)
+    index_cache = DiskCache(cache_module.TEMPLATE_INDEX_CACHE, cache_dir=tmp_path)
+    records_path = tmp_path / "records.jsonl"
+    records_path.write_text("\n".join(json.dumps({"CLIENT_NAME": f"Client {i}"}) for i in range(3)))
+    
+    with patch.object(template_manager, "TEMPLATES_DIR", tmp_path), \
+         patch.dict(cache_module._caches, {cache_module.EXPORT_CACHE: test_cache,
+                                           cache_module.TEMPLATE_INDEX_CACHE: index_cache}):
+        assert template_manager.get_available_templates() == ["letter"]
+        template_path = template_manager.get_template_path("letter")
+        assert template_path.endswith("letter.docx")
+        assert "[CLIENT_NAME]" in template_manager.read_template(template_path)
+        
+        exported = export_document("ignored", "DOCX", template_path, {"CLIENT_NAME": "Acme"})
+        document = docx.Document(io.BytesIO(exported))
+        assert document.paragraphs[0].text == "Dear Acme,"
+        assert export_document("ignored", "docx", template_path, {"CLIENT_NAME": "Acme"}) == exported
+        
+        result = run_batch("letter", str(records_path), str(tmp_path / "out"), export_format="docx", workers=1)
+    
+    assert result["rendered"] == 3
+    assert "Dear Client 2," in read_docx(str(tmp_path / "out" / "000003.docx"))
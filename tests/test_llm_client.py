@@ -0,0 +1,193 @@
+"""
+Tests for the bounded-concurrency LLM client.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock, PropertyMock
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.llm_client as llm_client
+from app.utils.llm_client import LLMClient
+from app.utils.rate_limiter import (
+    RateLimiter, TokenBucket, backoff_delay, retry_after_hint, is_retryable_error
+)
+
+class SlowModel:
+    """Fake model that records how many calls run at once."""
+    
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    
+    def __init__(self, model_name):
+        self.model_name = model_name
+    
+    def generate_content(self, prompt, **kwargs):
+        with SlowModel.lock:
+            SlowModel.active += 1
+            SlowModel.peak = max(SlowModel.peak, SlowModel.active)
+        time.sleep(0.05)
+        with SlowModel.lock:
+            SlowModel.active -= 1
+        response = MagicMock()
+        response.text = f"answer to {prompt}"
+        return response
+
+def test_generate_many_bounded_concurrency():
+    """Test that responses keep prompt order and concurrency stays bounded."""
+    SlowModel.peak = 0
+    client = LLMClient(max_concurrency=2)
+    with patch.object(llm_client.genai, "GenerativeModel", SlowModel):
+        responses = client.generate_many_sync("models/test", [f"q{i}" for i in range(6)])
+    
+    assert [response.text for response in responses] == [f"answer to q{i}" for i in range(6)]
+    assert SlowModel.peak == 2
+    
+    print("✅ Bounded concurrency test passed")
+
+def test_generate_async_and_timeout():
+    """Test the async API and the per-call timeout."""
+    client = LLMClient(max_concurrency=2)
+    with patch.object(llm_client.genai, "GenerativeModel", SlowModel):
+        response = asyncio.run(client.generate("models/test", "hello"))
+        assert response.text == "answer to hello"
+        
+        try:
+            client.generate_sync("models/test", "slow", timeout=0.001)
+            assert False, "Expected a timeout"
+        except TimeoutError as e:
+            assert "timed out" in str(e)
+    
+    print("✅ Async generation and timeout test passed")
+
+def test_timed_out_calls_do_not_block_later_ones():
+    """Test that the timeout reaches the SDK and hung calls do not hold up new requests."""
+    calls = []
+    
+    def generate_content(prompt, request_options=None):
+        calls.append(request_options)
+        if prompt == "hang":
+            # A call that ignores its timeout, as a stuck connection would
+            time.sleep(2)
+        response = MagicMock()
+        response.text = "fast"
+        return response
+    
+    model = MagicMock()
+    model.generate_content.side_effect = generate_content
+    client = LLMClient(max_concurrency=2, timeout=0.3, rate_limiter=RateLimiter(0, 0))
+    with patch.object(llm_client.genai, "GenerativeModel", return_value=model):
+        for prompt in ["hang", "hang"]:
+            try:
+                client.generate_sync("models/test", prompt)
+                assert False, "Expected a timeout"
+            except TimeoutError:
+                pass
+        assert client.generate_sync("models/test", "quick").text == "fast"
+    
+    assert calls[-1] == {"timeout": 0.3}
+
+class FlakyModel:
+    """Fake model that is throttled a few times before answering."""
+    
+    failures = 0
+    
+    def __init__(self, model_name):
+        self.model_name = model_name
+    
+    def generate_content(self, prompt, **kwargs):
+        if FlakyModel.failures > 0:
+            FlakyModel.failures -= 1
+            raise Exception("429 Resource has been exhausted. Please retry in 0.01s")
+        response = MagicMock()
+        response.text = "ok"
+        return response
+
+def test_generate_retries_throttled_calls():
+    """Test that throttled calls are retried instead of failing."""
+    FlakyModel.failures = 2
+    client = LLMClient(rate_limiter=RateLimiter(0, 0), max_retries=3)
+    with patch.object(llm_client.genai, "GenerativeModel", FlakyModel), \
+         patch("app.utils.rate_limiter.LLM_RETRY_BASE_DELAY", 0.01):
+        assert client.generate_sync("models/test", "hello").text == "ok"
+        
+        FlakyModel.failures = 5
+        try:
+            client.generate_sync("models/test", "hello")
+            assert False, "Expected the error after the last retry"
+        except Exception as e:
+            assert "429" in str(e)
+    
+    print("✅ Retry test passed")
+
+def test_daily_quota_errors_fail_fast():
+    """Test that per-day quota errors are raised without retrying."""
+    model = MagicMock()
+    model.generate_content.side_effect = Exception(
+        "429 Quota exceeded for quota metric 'GenerateRequestsPerDayPerProjectPerModel-FreeTier'. "
+        "Please retry in 20s"
+    )
+    client = LLMClient(rate_limiter=RateLimiter(0, 0), max_retries=3)
+    start = time.monotonic()
+    with patch.object(llm_client.genai, "GenerativeModel", return_value=model):
+        try:
+            client.generate_sync("models/test", "hello")
+            assert False, "Expected the quota error"
+        except Exception as e:
+            assert "PerDay" in str(e)
+    
+    assert model.generate_content.call_count == 1
+    assert time.monotonic() - start < 1
+
+def test_token_bucket_and_backoff():
+    """Test token bucket waits and retry delays."""
+    now = [0.0]
+    bucket = TokenBucket(60, period=60.0, clock=lambda: now[0])
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == 1.0
+    now[0] = 2.0
+    assert bucket.reserve(1) == 0.0
+    
+    assert retry_after_hint(Exception("retry_delay { seconds: 13 }")) == 13.0
+    assert 13.0 <= backoff_delay(0, Exception("Please retry in 13s"), base_delay=1) <= 14.0
+    assert 0.0 <= backoff_delay(3, base_delay=1, max_delay=5) <= 5.0
+    assert is_retryable_error(Exception("503 Service Unavailable"))
+    assert not is_retryable_error(Exception("400 Invalid argument"))
+    assert is_retryable_error(Exception("429 Resource has been exhausted"))
+    assert is_retryable_error(Exception("429 Quota exceeded for GenerateRequestsPerMinutePerProject"))
+    assert not is_retryable_error(Exception("429 Quota exceeded for GenerateRequestsPerDayPerProject"))
+    assert not is_retryable_error(Exception("429 Resource has been exhausted (e.g. check quota)."))
+    
+    print("✅ Token bucket and backoff test passed")
+
+def test_generate_stream():
+    """Test that streamed chunks are yielded as they arrive."""
+    model = MagicMock()
+    chunks = [MagicMock(text="Hello"), MagicMock(text=", "), MagicMock(text="world")]
+    model.generate_content.return_value = iter(chunks)
+    client = LLMClient(rate_limiter=RateLimiter(0, 0))
+    
+    with patch.object(llm_client.genai, "GenerativeModel", return_value=model):
+        stream = client.generate_stream("models/test", "hi")
+        assert next(stream) == "Hello"
+        assert "".join(stream) == ", world"
+    
+    model.generate_content.assert_called_once_with("hi", stream=True)
+    
+    print("✅ Streaming generation test passed")
+
+def test_generate_stream_skips_chunks_without_text():
+    """Test that a chunk without parts, e.g. a safety stop, ends the stream cleanly."""
+    blocked = MagicMock()
+    type(blocked).text = PropertyMock(side_effect=ValueError("finish_reason is SAFETY"))
+    model = MagicMock()
+    model.generate_content.return_value = iter([MagicMock(text="Partial answer"), blocked])
+    client = LLMClient(rate_limiter=RateLimiter(0, 0))
+    
+    with patch.object(llm_client.genai, "GenerativeModel", return_value=model):
+        assert list(client.generate_stream("models/test", "hi")) == ["Partial answer"]
@@ -0,0 +1,106 @@
+"""
+Tests for the preferred model resolution cache in app.utils.api.
+"""
+import os
+import sys
+import time
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.api as api
+
+def make_models(*names):
+    """Build mock model objects with the given names."""
+    models = []
+    for name in names:
+        model = MagicMock()
+        model.name = name
+        models.append(model)
+    return models
+
+def test_select_preferred_model():
+    """Test the preference order of model selection."""
+    names = ["models/gemini-pro-vision", "models/gemini-1.0-pro", "models/gemini-1.5-flash", "models/gemini-1.5-pro"]
+    assert api._select_preferred_model(names) == "models/gemini-1.5-pro"
+    assert api._select_preferred_model(names[:3]) == "models/gemini-1.5-flash"
+    assert api._select_preferred_model(names[:2]) == "models/gemini-1.0-pro"
+    assert api._select_preferred_model(names[:1]) == "models/gemini-pro-vision"
+    assert api._select_preferred_model(["models/text-bison"]) is None
+    
+    print("✅ Preferred model selection test passed")
+
+def test_model_cache_avoids_list_models(tmp_path):
+    """Test that list_models is only called once while the cache is fresh."""
+    cache_file = tmp_path / "preferred_model.json"
+    with patch.object(api, "CACHE_DIR", tmp_path), patch.object(api, "MODEL_CACHE_FILE", cache_file):
+        api.clear_model_cache()
+        list_models = MagicMock(return_value=iter(make_models("models/gemini-1.5-pro")))
+        with patch.object(api.genai, "list_models", list_models):
+            assert api.get_preferred_model() == "models/gemini-1.5-pro"
+            assert api.get_preferred_model() == "models/gemini-1.5-pro"
+        assert list_models.call_count == 1
+        assert cache_file.exists()
+        
+        # A new process starts with an empty memory cache but reads the disk cache
+        api._model_cache["name"] = None
+        with patch.object(api.genai, "list_models", side_effect=AssertionError("network call")):
+            assert api.get_preferred_model() == "models/gemini-1.5-pro"
+        
+        api.clear_model_cache()
+        assert not cache_file.exists()
+    
+    print("✅ Model cache test passed")
+
+def test_stale_model_cache_refreshes_in_background(tmp_path):
+    """Test that a stale entry is served while it is refreshed."""
+    cache_file = tmp_path / "preferred_model.json"
+    with patch.object(api, "CACHE_DIR", tmp_path), patch.object(api, "MODEL_CACHE_FILE", cache_file):
+        api.clear_model_cache()
+        api._store_model_cache("models/gemini-1.0-pro")
+        api._model_cache["resolved_at"] = time.time() - api.MODEL_CACHE_TTL - 1
+        
+        list_models = MagicMock(return_value=iter(make_models("models/gemini-1.5-pro")))
+        with patch.object(api.genai, "list_models", list_models):
+            assert api.get_preferred_model() == "models/gemini-1.0-pro"
+            api._model_refresh_thread.join(timeout=5)
+        assert api.get_preferred_model() == "models/gemini-1.5-pro"
+        
+        api.clear_model_cache()
+    
+    print("✅ Stale model cache refresh test passed")
+
+def test_is_model_not_found_error():
+    """Test detection of model-not-found API errors."""
+    assert api.is_model_not_found_error(Exception("404 models/gemini-x is not found"))
+    assert not api.is_model_not_found_error(Exception("429 Resource has been exhausted"))
+    
+    print("✅ Model not found detection test passed")
+
+def test_initialize_api_runs_once(tmp_path):
+    """Test that initialization configures once and checks models in the background."""
+    cache_file = tmp_path / "preferred_model.json"
+    state = {"configured": False, "healthy": None, "error": None, "model_count": 0, "checked_at": 0.0}
+    list_models = MagicMock(return_value=iter(make_models("models/gemini-1.5-pro")))
+    with patch.object(api, "CACHE_DIR", tmp_path), patch.object(api, "MODEL_CACHE_FILE", cache_file), \
+         patch.object(api, "API_KEY", "test-key"), patch.dict(api._api_state, state), \
+         patch.object(api.genai, "configure") as configure, \
+         patch.object(api.genai, "list_models", list_models):
+        api.clear_model_cache()
+        api.initialize_api(wait=True)
+        api.initialize_api()
+        api.initialize_api()
+        
+        assert configure.call_count == 1
+        assert list_models.call_count == 1
+        status = api.get_api_status()
+        assert status["healthy"] is True
+        assert status["model_count"] == 1
+        
+        # The check warmed the model cache, so no further listing is needed
+        assert api.get_preferred_model() == "models/gemini-1.5-pro"
+        assert list_models.call_count == 1
+        api.clear_model_cache()
+    
+    print("✅ API initialization test passed")
@@ -0,0 +1,57 @@
+"""
+Tests for the PDF layout used by generate_pdf.
+"""
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import PyPDF2
+
+from app.utils.document_processor import generate_pdf
+from app.utils.pdf_layout import get_font_metrics, wrap_line, paginate, layout_text
+
+def test_wrap_line():
+    """Test that long lines wrap within the width and keep every word."""
+    metrics = get_font_metrics()
+    line = "    " + " ".join(f"word{i}" for i in range(100))
+    lines = wrap_line(line, metrics, 300)
+    
+    assert len(lines) > 1
+    assert all(metrics.width(wrapped) <= 300 for wrapped in lines)
+    assert all(wrapped.startswith("    ") for wrapped in lines)
+    assert " ".join(wrapped.strip() for wrapped in lines) == line.strip()
+    
+    # Words wider than the line are broken, blank lines stay blank
+    assert len(wrap_line("x" * 500, metrics, 300)) > 1
+    assert wrap_line("", metrics, 300) == [""]
+
+def test_widow_and_orphan_control():
+    """Test that split paragraphs keep at least two lines on each page."""
+    lines = lambda n, tag: [f"{tag}{i}" for i in range(n)]
+    
+    # A three-line paragraph with one line of room moves to the next page
+    pages = paginate([lines(9, "a"), lines(3, "b")], lines_per_page=10)
+    assert pages == [lines(9, "a"), lines(3, "b")]
+    
+    # A paragraph that would leave one line on the next page leaves two
+    pages = paginate([lines(5, "a"), lines(6, "b")], lines_per_page=10)
+    assert pages[0] == lines(5, "a") + lines(4, "b")
+    assert pages[1] == lines(6, "b")[4:]
+    
+    # Paragraphs longer than a page still split
+    pages = paginate([lines(25, "a")], lines_per_page=10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+
+def test_layout_is_linear(tmp_path):
+    """Test that a long export lays out and renders every line."""
+    text = "\n".join(f"Line {i} " + "lorem ipsum dolor " * 10 for i in range(3000))
+    pages = layout_text(text)
+    assert len(pages) > 100
+    
+    output_path = tmp_path / "long.pdf"
+    assert generate_pdf(text, str(output_path))
+    reader = PyPDF2.PdfReader(str(output_path))
+    assert len(reader.pages) == len(pages)
+    assert "Line 2999" in reader.pages[-1].extract_text()
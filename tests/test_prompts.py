@@ -0,0 +1,78 @@
+"""
+Tests for prompt building and token budgets.
+"""
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.chunking import PAGE_BREAK
+from app.utils.prompts import (
+    compact, clean_document_text, strip_repeated_headers_footers, count_tokens,
+    build_prompt, TRUNCATION_MARKER
+)
+
+def test_compact():
+    """Test that indentation and blank lines are removed from instructions."""
+    text = """
+        First line
+            indented    line
+
+        Last line
+    """
+    assert compact(text) == "First line\nindented line\nLast line"
+
+def test_strip_repeated_headers_footers():
+    """Test that running headers and page numbers are removed but body text is kept."""
+    pages = [
+        f"ACME Corp Confidential\nSection {'ABCD'[i - 1]}\nBody text of page {i}\nmore text\nclosing line {'ABCD'[i - 1]}\nPage {i} of 4"
+        for i in range(1, 5)
+    ]
+    cleaned = strip_repeated_headers_footers(PAGE_BREAK.join(pages))
+    
+    assert "ACME Corp Confidential" not in cleaned
+    assert "of 4" not in cleaned
+    for i in range(1, 5):
+        assert f"Body text of page {i}" in cleaned
+    
+    # Text without page breaks is left alone
+    paragraphs = "\n\n".join(f"Article {i}\nTerms of article {i}" for i in range(1, 6))
+    assert strip_repeated_headers_footers(paragraphs) == paragraphs
+
+def test_strip_headers_footers_keeps_per_page_values():
+    """Test that lines differing only in their numbers are kept, unlike page numbers."""
+    pages = [
+        f"Invoice {n}\nItem: widget\nTotal due: ${n}.00\n{i}"
+        for i, n in enumerate([101, 202, 303], start=1)
+    ]
+    cleaned = strip_repeated_headers_footers(PAGE_BREAK.join(pages))
+    
+    for n in [101, 202, 303]:
+        assert f"Invoice {n}" in cleaned
+        assert f"Total due: ${n}.00" in cleaned
+        assert "Item: widget" in cleaned
+    # The bare page numbers at the bottom of each page are removed
+    assert not {"1", "2", "3"} & set(cleaned.split("\n"))
+    
+    # Repeated placeholder lines are fields, not letterheads
+    letter = PAGE_BREAK.join("[COMPANY_NAME]\nBody\nMore\nEnd" for _ in range(3))
+    assert strip_repeated_headers_footers(letter).count("[COMPANY_NAME]") == 3
+
+def test_clean_document_text():
+    """Test that layout whitespace is collapsed but line breaks are kept."""
+    text = "Name:    John   Smith   \n\n\n\n\nDate:  2024-01-01"
+    assert clean_document_text(text) == "Name: John Smith\n\nDate: 2024-01-01"
+
+def test_build_prompt_budget():
+    """Test that the content is truncated so the whole prompt fits the budget."""
+    prompt = build_prompt("Instructions", "word " * 5000, "Trailer", max_tokens=500)
+    
+    assert count_tokens(prompt) <= 500
+    assert prompt.startswith("Instructions")
+    assert prompt.endswith("Trailer")
+    assert TRUNCATION_MARKER.strip() in prompt
+    
+    # Short content is not truncated
+    prompt = build_prompt("Instructions", "short content", "Trailer", max_tokens=500)
+    assert prompt == "Instructions\n\nshort content\n\nTrailer"
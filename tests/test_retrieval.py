@@ -0,0 +1,64 @@
+"""
+Tests for local retrieval over the active document.
+"""
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.retrieval import DocumentIndex, get_document_index, tokenize
+from app.utils.chat_context import ChatContext
+from app.utils.prompts import count_tokens
+
+def _long_document():
+    """A document of many paragraphs, one of which mentions the warranty."""
+    paragraphs = [f"Section {i}. The supplier delivers batch {i} of the product." for i in range(300)]
+    paragraphs[150] = "Section 150. The warranty period is 24 months from the delivery date."
+    return "\n\n".join(paragraphs)
+
+def test_tokenize():
+    """Test that terms are lowercased and stopwords removed."""
+    assert tokenize("What is the Due Date?") == ["due", "date"]
+
+def test_search_ranks_relevant_chunk_first():
+    """Test that BM25 finds the chunk that mentions the query terms."""
+    index = DocumentIndex(_long_document(), chunk_tokens=50)
+    assert len(index.chunks) > 10
+    
+    excerpts = index.excerpts("How long is the warranty period?", k=1)
+    assert len(excerpts) == 1
+    assert "warranty period is 24 months" in excerpts[0]
+    assert index.search("nonexistentterm") == []
+
+def test_lookup():
+    """Test that single-field questions are answered from label: value lines."""
+    index = DocumentIndex("INVOICE\nInvoice Number: INV-001\nDue Date: 2024-03-01\nTotal:   $1,250.00\n")
+    
+    assert index.lookup("What is the due date?") == "Due Date: 2024-03-01"
+    assert index.lookup("what's the total") == "Total: $1,250.00"
+    assert index.lookup("What is the date due?") == "Due Date: 2024-03-01"
+    # Questions that need reasoning go to the model
+    assert index.lookup("Is the invoice overdue?") is None
+    assert index.lookup("What is the shipping address?") is None
+
+def test_index_is_cached_by_content():
+    """Test that each document is indexed once."""
+    text = _long_document()
+    assert get_document_index(text) is get_document_index(str(text))
+    assert get_document_index(text + " ") is not get_document_index(text)
+
+def test_chat_context_retrieves_excerpts_for_long_documents():
+    """Test that long documents are represented by relevant excerpts only."""
+    context = ChatContext("Instructions", max_tokens=2000, document_tokens=500)
+    context.set_document(_long_document())
+    prompt = context.build_prompt("How long is the warranty period?")
+    
+    assert "warranty period is 24 months" in prompt
+    assert "batch 10 " not in prompt
+    assert count_tokens(prompt) <= 2000
+    
+    # Short documents are still sent whole
+    context.set_document("Due Date: 2024-03-01\nTotal: $100")
+    assert "Total: $100" in context.build_prompt("Summarize the document")
+    assert context.lookup("What is the due date?") == "Due Date: 2024-03-01"
@@ -0,0 +1,58 @@
+"""
+Tests for structured JSON output handling.
+"""
+import os
+import sys
+import json
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.api as api
+from app.utils.structured_output import (
+    EXTRACTION_SCHEMA, TEMPLATE_FIELDS_SCHEMA, parse_json_response, matches_schema
+)
+
+def test_parse_json_response():
+    """Test parsing plain JSON, and JSON wrapped in fences or prose."""
+    assert parse_json_response('{"a": 1}') == {"a": 1}
+    assert parse_json_response('```json\n{"a": 1}\n```') == {"a": 1}
+    assert parse_json_response('Here you go: {"a": [1, 2]} Done.') == {"a": [1, 2]}
+    assert parse_json_response("no json here") is None
+    assert parse_json_response("[1, 2]") is None
+    
+    print("✅ JSON response parsing test passed")
+
+def test_matches_schema():
+    """Test local validation against the response schemas."""
+    assert matches_schema({"fields": ["NAME", "DATE"]}, TEMPLATE_FIELDS_SCHEMA)
+    assert not matches_schema({"fields": "NAME"}, TEMPLATE_FIELDS_SCHEMA)
+    assert not matches_schema({}, TEMPLATE_FIELDS_SCHEMA)
+    assert matches_schema({"names": ["Acme"], "extra": {"x": 1}}, EXTRACTION_SCHEMA)
+    assert not matches_schema({"names": [1]}, EXTRACTION_SCHEMA)
+    assert not matches_schema(True, {"type": "integer"})
+    
+    print("✅ Schema validation test passed")
+
+def test_requests_use_response_schema():
+    """Test that extraction and template analysis request JSON output."""
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = '{"fields": ["{{CLIENT_NAME}}"]}'
+    
+    with patch.object(api, "get_preferred_model", return_value="models/gemini-1.5-pro"), \
+         patch.object(api.genai, "GenerativeModel", return_value=mock_model), \
+         patch.object(api, "get_cache") as mock_get_cache:
+        mock_get_cache.return_value.get.return_value = None
+        assert api.analyze_template("Dear {{CLIENT_NAME}}") == ["CLIENT_NAME"]
+        config = mock_model.generate_content.call_args.kwargs["generation_config"]
+        assert config["response_mime_type"] == "application/json"
+        assert config["response_schema"] == TEMPLATE_FIELDS_SCHEMA
+        
+        mock_model.generate_content.return_value.text = '```json\n{"names": ["Acme"]}\n```'
+        result = api.extract_document_content("Agreement with Acme")
+        assert json.loads(result) == {"names": ["Acme"]}
+        config = mock_model.generate_content.call_args.kwargs["generation_config"]
+        assert config["response_schema"] == EXTRACTION_SCHEMA
+    
+    print("✅ Response schema request test passed")
@@ -0,0 +1,139 @@
+"""
+Tests for the in-memory template registry.
+"""
+import io
+import os
+import sys
+from unittest.mock import patch
+
+import docx
+from reportlab.pdfgen import canvas
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.cache as cache_module
+import app.utils.template_manager as template_manager
+from app.utils.cache import DiskCache
+from app.utils.template_manager import TemplateRegistry
+
+def test_registry_manifest(tmp_path):
+    """Test that the manifest holds paths, hashes and placeholders."""
+    (tmp_path / "letter.txt").write_text("Dear [NAME],\nRe: [SUBJECT] for [NAME]")
+    (tmp_path / "notes.md").write_text("not a template")
+    registry = TemplateRegistry(tmp_path)
+    
+    assert registry.names() == ["letter"]
+    info = registry.get("letter")
+    assert info.path == str(tmp_path / "letter.txt")
+    assert info.placeholders == ["NAME", "SUBJECT"]
+    assert len(info.content_hash) == 64
+    assert registry.get("missing") is None
+
+def test_registry_rescans_only_on_change(tmp_path):
+    """Test that unchanged directories are not listed again and changed files are reread."""
+    (tmp_path / "letter.txt").write_text("Dear [NAME]")
+    registry = TemplateRegistry(tmp_path)
+    registry.names()
+    
+    with patch.object(template_manager.os, "scandir", side_effect=AssertionError("rescanned")):
+        assert registry.names() == ["letter"]
+        assert registry.get("letter").placeholders == ["NAME"]
+    
+    # Adding a file changes the directory mtime
+    (tmp_path / "invoice.txt").write_text("Total: [TOTAL]")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 10**9))
+    assert registry.names() == ["invoice", "letter"]
+    
+    # Editing a file in place is picked up when it is read
+    letter = registry.get("letter")
+    (tmp_path / "letter.txt").write_text("Dear [NAME] of [COMPANY]")
+    os.utime(tmp_path / "letter.txt", ns=(0, letter.mtime + 10**9))
+    assert registry.get("letter").placeholders == ["NAME", "COMPANY"]
+    assert registry.get("invoice") is not None
+
+def _test_caches(tmp_path):
+    """Template caches in a temporary directory, so tests leave the app's caches alone."""
+    cache_dir = tmp_path / "cache"
+    return {
+        cache_module.TEMPLATE_ANALYSIS_CACHE: DiskCache(cache_module.TEMPLATE_ANALYSIS_CACHE, cache_dir=cache_dir),
+        cache_module.TEMPLATE_INDEX_CACHE: DiskCache(cache_module.TEMPLATE_INDEX_CACHE, cache_dir=cache_dir),
+    }
+
+def test_template_manager_uses_registry(tmp_path):
+    """Test the module-level functions on top of the registry."""
+    with patch.object(template_manager, "TEMPLATES_DIR", tmp_path), \
+         patch.dict(cache_module._caches, _test_caches(tmp_path)):
+        assert template_manager.save_template("memo", "To: [RECIPIENT]")
+        assert template_manager.get_available_templates() == ["memo"]
+        path = template_manager.get_template_path("memo")
+        assert template_manager.list_templates() == {"memo": path}
+        assert template_manager.read_template(path) == "To: [RECIPIENT]"
+        
+        # Saving again is seen even if the directory mtime does not change
+        assert template_manager.save_template("memo", "From: [SENDER]")
+        assert template_manager.read_template(path) == "From: [SENDER]"
+        assert template_manager.get_template_info("memo").placeholders == ["SENDER"]
+
+def _upload(name, content):
+    """A file object like the ones Streamlit's uploader returns."""
+    uploaded_file = io.BytesIO(content)
+    uploaded_file.name = name
+    return uploaded_file
+
+def test_uploaded_pdf_template_is_converted(tmp_path):
+    """Test that a PDF template is saved as its text, not its bytes."""
+    pdf = io.BytesIO()
+    c = canvas.Canvas(pdf)
+    c.drawString(50, 750, "Invoice for [CLIENT_NAME]")
+    c.drawString(50, 730, "Total:   [TOTAL]")
+    c.save()
+    
+    with patch.object(template_manager, "TEMPLATES_DIR", tmp_path), \
+         patch.dict(cache_module._caches, _test_caches(tmp_path)):
+        path = template_manager.save_uploaded_template(_upload("invoice.pdf", pdf.getvalue()))
+        assert path == str(tmp_path / "invoice.txt")
+        content = template_manager.read_template(path)
+        assert "Invoice for [CLIENT_NAME]" in content
+        assert "%PDF" not in content
+        assert template_manager.get_template_info("invoice").placeholders == ["CLIENT_NAME", "TOTAL"]
+
+def test_uploaded_pdf_template_keeps_repeated_fields(tmp_path):
+    """Test that placeholders repeated on every page, like a letterhead, are kept."""
+    pdf = io.BytesIO()
+    c = canvas.Canvas(pdf)
+    for page in range(1, 4):
+        c.drawString(50, 750, "[COMPANY_NAME]")
+        c.drawString(50, 730, f"[FIELD_{page}]")
+        c.showPage()
+    c.save()
+    
+    with patch.object(template_manager, "TEMPLATES_DIR", tmp_path), \
+         patch.dict(cache_module._caches, _test_caches(tmp_path)):
+        path = template_manager.save_uploaded_template(_upload("letterhead.pdf", pdf.getvalue()))
+        assert path is not None
+        content = template_manager.read_template(path)
+        assert content.count("[COMPANY_NAME]") == 3
+        assert "\f" not in content
+        assert template_manager.get_template_info("letterhead").placeholders == [
+            "COMPANY_NAME", "FIELD_1", "FIELD_2", "FIELD_3"
+        ]
+
+def test_uploaded_docx_template_is_indexed_once(tmp_path):
+    """Test that a DOCX template is parsed at upload and then served from the index."""
+    document = docx.Document()
+    document.add_paragraph("Dear [NAME],")
+    document.add_paragraph("Your order [ORDER_ID] has shipped.")
+    content = io.BytesIO()
+    document.save(content)
+    
+    with patch.object(template_manager, "TEMPLATES_DIR", tmp_path), \
+         patch.dict(cache_module._caches, _test_caches(tmp_path)):
+        path = template_manager.save_uploaded_template(_upload("letter.docx", content.getvalue()))
+        assert path == str(tmp_path / "letter.docx")
+        
+        # A new registry, as in another process, reads the index instead of the DOCX
+        with patch.object(template_manager, "read_docx", side_effect=AssertionError("parsed again")):
+            info = template_manager.TemplateRegistry(tmp_path).get("letter")
+        assert info.content == "Dear [NAME],\nYour order [ORDER_ID] has shipped.\n"
+        assert info.placeholders == ["NAME", "ORDER_ID"]
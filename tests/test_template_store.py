@@ -0,0 +1,77 @@
+"""
+Tests for the SQLite template store.
+"""
+import io
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.utils.cache as cache_module
+import app.utils.template_manager as template_manager
+from app.utils.cache import DiskCache
+from app.utils.template_store import TemplateStore
+
+def test_store_versions(tmp_path):
+    """Test that saves add versions, and saving unchanged content does not."""
+    store = TemplateStore(tmp_path / "templates.sqlite3")
+    assert store.save("letter", "Dear [NAME]") == 1
+    assert store.save("letter", "Dear [NAME]") == 1
+    assert store.save("letter", "Dear [NAME],\nRe: [SUBJECT] for [NAME]") == 2
+    
+    template = store.get("letter")
+    assert template["version"] == 2
+    assert template["placeholders"] == ["NAME", "SUBJECT"]
+    assert store.get("letter", version=1)["content"] == "Dear [NAME]"
+    assert [version for version, _, _ in store.versions("letter")] == [1, 2]
+    assert store.get("missing") is None
+    
+    compiled = store.get_compiled("letter")
+    assert compiled.render({"NAME": "Ann", "SUBJECT": "Invoice"}) == "Dear Ann,\nRe: Invoice for Ann"
+
+def test_store_pagination_and_usage(tmp_path):
+    """Test paginated listing, prefix filtering and usage ordering."""
+    store = TemplateStore(tmp_path / "templates.sqlite3")
+    for name in ["invoice", "invoice_eu", "letter", "memo"]:
+        store.save(name, f"{name} [FIELD]")
+    
+    assert store.count() == 4
+    assert store.list_names(limit=2) == ["invoice", "invoice_eu"]
+    assert store.list_names(offset=2, limit=2) == ["letter", "memo"]
+    assert store.list_names(prefix="inv") == ["invoice", "invoice_eu"]
+    
+    store.record_use("memo")
+    store.record_use("memo")
+    store.record_use("letter")
+    assert store.list_names(limit=2, by_usage=True) == ["memo", "letter"]
+    assert store.get("memo")["use_count"] == 2
+
+def test_template_manager_sqlite_backend(tmp_path):
+    """Test that template_manager imports existing files and serves them from the store."""
+    (tmp_path / "letter.txt").write_text("Dear [NAME]")
+    analysis_cache = DiskCache(cache_module.TEMPLATE_ANALYSIS_CACHE, cache_dir=tmp_path / "cache")
+    with patch.object(template_manager, "TEMPLATES_DIR", tmp_path), \
+         patch.object(template_manager, "TEMPLATE_STORE", "sqlite"), \
+         patch.dict(template_manager._stores, clear=True), \
+         patch.dict(cache_module._caches, {cache_module.TEMPLATE_ANALYSIS_CACHE: analysis_cache}):
+        assert template_manager.get_available_templates() == ["letter"]
+        path = template_manager.get_template_path("letter")
+        assert path == "sqlite://letter.txt"
+        assert template_manager.read_template(path) == "Dear [NAME]"
+        assert template_manager.get_template_info("letter").placeholders == ["NAME"]
+        
+        upload = io.BytesIO(b"Total: [TOTAL]")
+        upload.name = "invoice.txt"
+        assert template_manager.save_uploaded_template(upload) == "sqlite://invoice.txt"
+        assert template_manager.list_templates_page(limit=1) == ["invoice"]
+        assert template_manager.save_template("letter", "Hello [NAME]")
+        assert len(template_manager.get_template_versions("letter")) == 2
+        assert template_manager.read_template_file("sqlite://letter.txt") == b"Hello [NAME]"
+        
+        # Filling uses the segments saved with the template instead of tokenizing it again
+        with patch.object(template_manager, "compile_template", side_effect=AssertionError("recompiled")):
+            compiled = template_manager.get_compiled_template("sqlite://letter.txt")
+        assert compiled.render({"NAME": "Ann"}) == "Hello Ann"
+        assert not (tmp_path / "invoice.txt").exists()